@@ -1,24 +1,95 @@
-from typing import Callable
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Union
 
 import numpy as np
 
-from policies import tabular_random_uniform_policy
-from utils import step_until_the_end_of_the_episode_and_generate_trajectory
+from checkpoints import Checkpointer
+from dtypes import DTypePolicy, as_dtype_policy
+from envs import VectorEnv
+from instrumentation import EarlyStopping, Stats, instrumented
+from kernels import compiled_arrays, kernel_seed, q_learning_kernel, sarsa_kernel, use_numba
+from models import TransitionModel, as_transition_model
+from policies import DeterministicPolicy, EpsilonGreedyPolicy, TabularPolicy, as_policy, \
+    tabular_random_uniform_policy
+from samplers import UniformStream, reseed
+from trajectory_store import TrajectoryStore
+from utils import ReplayBuffer, SparseTraces, TrajectoryBuffer, discounted_returns, first_visit_mask, \
+    first_visit_scratch, scatter_update, step_until_the_end_of_the_episode_and_generate_trajectory, terminal_mask_of
 
 
+def _vectorized_policy_evaluation(
+        model: TransitionModel,
+        Pi: np.ndarray,
+        V: np.ndarray,
+        gamma: float,
+        theta: float,
+        sweep: str,
+        block_size: int,
+        max_sweeps: int = None,
+        stats: Stats = None
+) -> (np.ndarray, int):
+    states_count = V.shape[0]
+    if sweep == "jacobi":
+        block_size = states_count
+    sweeps = 0
+    while True:
+        delta = 0.0
+        for lo in range(0, states_count, block_size):
+            hi = min(lo + block_size, states_count)
+            new_v = np.sum(Pi[lo:hi] * model.action_values(V, gamma, lo, hi), axis=1)
+            delta = max(delta, np.max(np.abs(V[lo:hi] - new_v)))
+            V[lo:hi] = new_v
+        sweeps += 1
+        if stats is not None:
+            stats.sweep(delta, states_count)
+        if delta < theta or sweeps == max_sweeps:
+            break
+    return V, sweeps
+
+
+def _greedy_policy(model: TransitionModel, V: np.ndarray, gamma: float) -> np.ndarray:
+    Pi = np.zeros((model.states_count, model.actions_count), dtype=V.dtype)
+    Pi[np.arange(model.states_count), np.argmax(model.action_values(V, gamma), axis=1)] = 1.0
+    return Pi
+
+
+def _initial_values(S: np.ndarray, T: np.ndarray, V0: np.ndarray = None, dtypes: DTypePolicy = None) -> np.ndarray:
+    dtypes = as_dtype_policy(dtypes)
+    V = dtypes.values(np.random.random((S.shape[0],))) if V0 is None else np.array(V0, dtype=dtypes.value)
+    V[T] = 0.0
+    return V
+
+
+@instrumented
 def iterative_policy_evaluation(
         S: np.ndarray,
         A: np.ndarray,
-        P: np.ndarray,
+        P: Union[np.ndarray, TransitionModel],
         T: np.ndarray,
         Pi: np.ndarray,
         gamma: float = 0.99,
-        theta: float = 0.00001
+        theta: float = 0.00001,
+        backend: str = "numpy",
+        sweep: str = "jacobi",
+        block_size: int = 256,
+        V0: np.ndarray = None,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
 ) -> np.ndarray:
     assert theta > 0
     assert 0 <= gamma <= 1
-    V = np.random.random((S.shape[0],))
-    V[T] = 0.0
+    assert backend in ("python", "numpy")
+    assert backend == "numpy" or isinstance(P, np.ndarray)
+    assert sweep in ("jacobi", "gauss_seidel", "prioritized")
+    assert block_size > 0
+    if sweep == "prioritized":
+        assert backend == "numpy"
+        return prioritized_sweeping(S, A, P, T, Pi, gamma, theta, V0=V0, dtypes=dtypes, stats=stats)[0]
+    V = _initial_values(S, T, V0, dtypes)
+    if backend == "numpy":
+        return _vectorized_policy_evaluation(as_transition_model(P), Pi, V, gamma, theta, sweep, block_size,
+                                             stats=stats)[0]
     while True:
         delta = 0
         for s in S:
@@ -31,22 +102,107 @@ def iterative_policy_evaluation(
                     )
             V[s] = new_v
             delta = np.maximum(delta, np.abs(v_temp - new_v))
+        if stats is not None:
+            stats.sweep(delta, S.shape[0])
         if delta < theta:
             break
     return V
 
 
+@instrumented
+def linear_policy_evaluation(
+        S: np.ndarray,
+        A: np.ndarray,
+        P: Union[np.ndarray, TransitionModel],
+        T: np.ndarray,
+        Pi: np.ndarray,
+        gamma: float = 0.99,
+        theta: float = 0.00001,
+        solver: str = "auto",
+        dense_max_states: int = 2000,
+        V0: np.ndarray = None,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
+) -> np.ndarray:
+    assert theta > 0
+    assert 0 <= gamma <= 1
+    assert solver in ("auto", "dense", "gmres", "bicgstab")
+    model = as_transition_model(P)
+    states_count = S.shape[0]
+    if solver == "auto":
+        solver = "dense" if states_count <= dense_max_states else "bicgstab"
+
+    R_pi = np.sum(Pi * model.expected_rewards, axis=1)
+    R_pi[T] = 0.0
+    P_pi = model.policy_transitions(Pi, dense=solver == "dense")
+
+    if solver == "dense":
+        P_pi[T, :] = 0.0
+        return as_dtype_policy(dtypes).values(np.linalg.solve(np.eye(states_count) - gamma * P_pi, R_pi))
+
+    from scipy.sparse import diags, identity
+    from scipy.sparse.linalg import bicgstab, gmres
+    absorbing = np.ones(states_count)
+    absorbing[T] = 0.0
+    system = identity(states_count, format='csr') - gamma * (diags(absorbing) @ P_pi)
+    x0 = None
+    if V0 is not None:
+        x0 = np.array(V0, dtype=np.float64)
+        x0[T] = 0.0
+    krylov_solver = gmres if solver == "gmres" else bicgstab
+    V, info = krylov_solver(system, R_pi, x0=x0, rtol=0.0, atol=theta)
+    if info != 0:
+        raise RuntimeError(f"{solver} did not converge (info={info})")
+    return as_dtype_policy(dtypes).values(V)
+
+
+@instrumented
 def policy_iteration(
         S: np.ndarray,
         A: np.ndarray,
-        P: np.ndarray,
+        P: Union[np.ndarray, TransitionModel],
         T: np.ndarray,
         gamma: float = 0.99,
-        theta: float = 0.00001
+        theta: float = 0.00001,
+        backend: str = "numpy",
+        sweep: str = "jacobi",
+        block_size: int = 256,
+        evaluation: str = "iterative",
+        solver: str = "auto",
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
 ) -> (np.ndarray, np.ndarray):
-    Pi = tabular_random_uniform_policy(S.shape[0], A.shape[0])
+    assert backend in ("python", "numpy")
+    assert backend == "numpy" or isinstance(P, np.ndarray)
+    assert evaluation in ("iterative", "linear")
+    assert evaluation == "iterative" or backend == "numpy"
+    Pi = as_dtype_policy(dtypes).values(tabular_random_uniform_policy(S.shape[0], A.shape[0]))
+    if backend == "numpy":
+        model = as_transition_model(P)
+
+        def evaluate(V_prev: np.ndarray = None) -> np.ndarray:
+            if evaluation == "linear":
+                return linear_policy_evaluation(S, A, model, T, Pi, gamma, theta, solver, V0=V_prev, dtypes=dtypes,
+                                                stats=stats)
+            return iterative_policy_evaluation(S, A, model, T, Pi, gamma, theta, backend, sweep, block_size, V_prev,
+                                               dtypes, stats)
+
+        V = None
+        while True:
+            V = evaluate(V)
+            old_actions = np.argmax(Pi, axis=1)
+            Q = model.action_values(V, gamma)
+            # A state only switches when another action beats its current one by more than the
+            # solver's noise; otherwise exact ties can flip argmax back and forth forever.
+            improved = np.max(Q, axis=1) > Q[S, old_actions] + 1e-12 * max(1.0, float(np.max(np.abs(Q))))
+            best_actions = np.where(improved, np.argmax(Q, axis=1), old_actions)
+            Pi[:, :] = 0.0
+            Pi[S, best_actions] = 1.0
+            if not np.any(improved):
+                break
+        return evaluate(V), Pi
     while True:
-        V = iterative_policy_evaluation(S, A, P, T, Pi, gamma, theta)
+        V = iterative_policy_evaluation(S, A, P, T, Pi, gamma, theta, backend, dtypes=dtypes, stats=stats)
         policy_stable = True
         for s in S:
             old_action = np.argmax(Pi[s])
@@ -67,48 +223,430 @@ def policy_iteration(
                 policy_stable = False
         if policy_stable:
             break
-    V = iterative_policy_evaluation(S, A, P, T, Pi, gamma, theta)
+    V = iterative_policy_evaluation(S, A, P, T, Pi, gamma, theta, backend, dtypes=dtypes, stats=stats)
     return V, Pi
 
 
+@instrumented
+def value_iteration(
+        S: np.ndarray,
+        A: np.ndarray,
+        P: Union[np.ndarray, TransitionModel],
+        T: np.ndarray,
+        gamma: float = 0.99,
+        theta: float = 0.00001,
+        sweep: str = "jacobi",
+        block_size: int = 256,
+        V0: np.ndarray = None,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
+) -> (np.ndarray, np.ndarray, int, int):
+    assert theta > 0
+    assert 0 <= gamma <= 1
+    assert sweep in ("jacobi", "gauss_seidel")
+    assert block_size > 0
+    model = as_transition_model(P)
+    states_count = S.shape[0]
+    if sweep == "jacobi":
+        block_size = states_count
+    V = _initial_values(S, T, V0, dtypes)
+    sweeps = 0
+    while True:
+        delta = 0.0
+        for lo in range(0, states_count, block_size):
+            hi = min(lo + block_size, states_count)
+            new_v = np.max(model.action_values(V, gamma, lo, hi), axis=1)
+            delta = max(delta, np.max(np.abs(V[lo:hi] - new_v)))
+            V[lo:hi] = new_v
+        sweeps += 1
+        if stats is not None:
+            stats.sweep(delta, states_count)
+        if delta < theta:
+            break
+    return V, _greedy_policy(model, V, gamma), sweeps, sweeps
+
+
+@instrumented
+def modified_policy_iteration(
+        S: np.ndarray,
+        A: np.ndarray,
+        P: Union[np.ndarray, TransitionModel],
+        T: np.ndarray,
+        k: int = 5,
+        gamma: float = 0.99,
+        theta: float = 0.00001,
+        sweep: str = "jacobi",
+        block_size: int = 256,
+        V0: np.ndarray = None,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
+) -> (np.ndarray, np.ndarray, int, int):
+    assert k > 0
+    assert theta > 0
+    assert 0 <= gamma <= 1
+    assert sweep in ("jacobi", "gauss_seidel")
+    assert block_size > 0
+    model = as_transition_model(P)
+    V = _initial_values(S, T, V0, dtypes)
+    iterations = 0
+    sweeps = 0
+    while True:
+        Q = model.action_values(V, gamma)
+        iterations += 1
+        sweeps += 1
+        best_actions = np.argmax(Q, axis=1)
+        new_v = Q[S, best_actions]
+        delta = np.max(np.abs(V - new_v))
+        V[:] = new_v
+        if stats is not None:
+            stats.sweep(delta, S.shape[0])
+        if delta < theta:
+            break
+        if k > 1:
+            Pi = np.zeros((S.shape[0], A.shape[0]), dtype=V.dtype)
+            Pi[S, best_actions] = 1.0
+            V, evaluation_sweeps = _vectorized_policy_evaluation(model, Pi, V, gamma, theta, sweep, block_size,
+                                                                 max_sweeps=k - 1, stats=stats)
+            sweeps += evaluation_sweeps
+    return V, _greedy_policy(model, V, gamma), iterations, sweeps
+
+
+@instrumented
+def prioritized_sweeping(
+        S: np.ndarray,
+        A: np.ndarray,
+        P: Union[np.ndarray, TransitionModel],
+        T: np.ndarray,
+        Pi: np.ndarray = None,
+        gamma: float = 0.99,
+        theta: float = 0.00001,
+        max_backups: int = None,
+        V0: np.ndarray = None,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
+) -> (np.ndarray, np.ndarray, int):
+    assert theta > 0
+    assert 0 <= gamma <= 1
+    model = as_transition_model(P)
+    predecessors_indptr, predecessors = model.predecessors()
+    V = _initial_values(S, T, V0, dtypes)
+
+    def backup(states: np.ndarray) -> np.ndarray:
+        Q = model.action_values_at(V, gamma, states)
+        return np.max(Q, axis=1) if Pi is None else np.sum(Pi[states] * Q, axis=1)
+
+    def backup_one(s: int) -> float:
+        Q = model.action_values_of(V, gamma, s)
+        return np.max(Q) if Pi is None else np.dot(Pi[s], Q)
+
+    priority = np.abs(backup(S) - V)
+    priority[priority <= theta] = 0.0
+    queue = [(-priority[s], s) for s in np.flatnonzero(priority)]
+    heapq.heapify(queue)
+
+    backups = 0
+    while queue and backups != max_backups:
+        neg_error, s = heapq.heappop(queue)
+        if priority[s] != -neg_error:
+            continue
+        priority[s] = 0.0
+        V[s] = backup_one(s)
+        backups += 1
+
+        preds = predecessors[predecessors_indptr[s]:predecessors_indptr[s + 1]]
+        if preds.shape[0] == 0:
+            continue
+        errors = np.abs(backup(preds) - V[preds])
+        above = errors > theta
+        for p, error in zip(preds[above].tolist(), errors[above].tolist()):
+            if error > priority[p]:
+                priority[p] = error
+                heapq.heappush(queue, (-error, p))
+
+    if stats is not None:
+        stats.backups += backups
+    if Pi is None:
+        Pi = _greedy_policy(model, V, gamma)
+    return V, Pi, backups
+
+
+def _first_visit_prediction_update(
+        s_list: np.ndarray,
+        r_list: np.ndarray,
+        gamma: float,
+        returns: np.ndarray,
+        returns_count: np.ndarray,
+        first_visit: np.ndarray
+) -> np.ndarray:
+    G = discounted_returns(r_list, gamma)
+    first = first_visit_mask(s_list, first_visit)
+    s_first = s_list[first]
+    # First visits are unique, so these fancy-indexed adds are exact scatter-adds.
+    returns[s_first] += G[first]
+    returns_count[s_first] += 1
+    return s_first
+
+
+def _first_visit_control_update(
+        s_list: np.ndarray,
+        a_list: np.ndarray,
+        r_list: np.ndarray,
+        gamma: float,
+        Q: np.ndarray,
+        returns: np.ndarray,
+        returns_count: np.ndarray,
+        first_visit: np.ndarray
+) -> np.ndarray:
+    G = discounted_returns(r_list, gamma)
+    first = first_visit_mask(s_list.astype(np.int64) * Q.shape[1] + a_list, first_visit)
+    s_first, a_first = s_list[first], a_list[first]
+    # First visits are unique, so these fancy-indexed adds are exact scatter-adds.
+    returns[s_first, a_first] += G[first]
+    returns_count[s_first, a_first] += 1
+    Q[s_first, a_first] = returns[s_first, a_first] / returns_count[s_first, a_first]
+    return s_first
+
+
+def _off_policy_episode_update(
+        s_list: np.ndarray,
+        a_list: np.ndarray,
+        r_list: np.ndarray,
+        gamma: float,
+        Q: np.ndarray,
+        C: np.ndarray,
+        greedy_actions: np.ndarray,
+        behaviour_probabilities: np.ndarray
+) -> None:
+    G = 0.0
+    W = 1
+    for t in reversed(range(len(s_list))):
+        G = gamma * G + r_list[t]
+        st = s_list[t]
+        at = a_list[t]
+        C[st, at] += W
+
+        Q[st, at] += W / C[st, at] * (G - Q[st, at])
+        greedy_actions[st] = np.argmax(Q[st, :])
+        if greedy_actions[st] != at:
+            break
+        W = W / behaviour_probabilities[t]
+
+
+def _seed_sequence(seed: int = None) -> np.random.SeedSequence:
+    return np.random.SeedSequence(np.random.randint(2 ** 32) if seed is None else seed)
+
+
+# Set once in every worker process by _install_worker, so the environment (and the evaluated
+# policy) cross the process boundary once per worker instead of once per task.
+_worker = {}
+
+
+def _install_worker(
+        pi: Union[np.ndarray, TabularPolicy],
+        reset_func: Callable,
+        step_func: Callable,
+        is_terminal_func: Callable
+) -> None:
+    _worker["pi"] = pi
+    _worker["reset_func"] = reset_func
+    _worker["step_func"] = step_func
+    _worker["is_terminal_func"] = is_terminal_func
+
+
+def _worker_pool(
+        n_jobs: int,
+        pi: Union[np.ndarray, TabularPolicy],
+        reset_func: Callable,
+        step_func: Callable,
+        is_terminal_func: Callable
+) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=n_jobs, initializer=_install_worker,
+                               initargs=(pi, reset_func, step_func, is_terminal_func))
+
+
+def _first_visit_prediction_worker(
+        episodes: int,
+        max_steps_per_episode: int,
+        gamma: float,
+        exploring_starts: bool,
+        seed_sequence: np.random.SeedSequence
+) -> (np.ndarray, np.ndarray, np.ndarray):
+    reseed(seed_sequence.generate_state(4))
+    pi, reset_func, step_func, is_terminal_func = (_worker[name] for name in ("pi", "reset_func", "step_func",
+                                                                              "is_terminal_func"))
+    states_count = pi.shape[0]
+    returns = np.zeros(states_count)
+    returns_count = np.zeros(states_count)
+    policy = as_policy(pi)
+    buffer = TrajectoryBuffer(max_steps_per_episode)
+    first_visit = first_visit_scratch(states_count)
+    lengths = np.zeros(episodes, dtype=np.int64)
+    for episode_id in range(episodes):
+        s0 = np.random.randint(states_count) if exploring_starts else reset_func()
+        s_list, _, _, r_list = step_until_the_end_of_the_episode_and_generate_trajectory(s0, policy, step_func,
+                                                                                         is_terminal_func,
+                                                                                         max_steps_per_episode,
+                                                                                         buffer)
+        _first_visit_prediction_update(s_list, r_list, gamma, returns, returns_count, first_visit)
+        lengths[episode_id] = s_list.shape[0]
+    return returns, returns_count, lengths
+
+
+def _trajectory_batch_worker(
+        greedy_actions: np.ndarray,
+        epsilon: float,
+        episodes: int,
+        max_steps_per_episode: int,
+        seed_sequence: np.random.SeedSequence
+) -> (np.ndarray, np.ndarray, np.ndarray, np.ndarray):
+    # The installed policy is an EpsilonGreedyPolicy whose Q is never read here: only its greedy
+    # actions and epsilon, sent with every task, change from one round to the next.
+    reseed(seed_sequence.generate_state(4))
+    policy, reset_func, step_func, is_terminal_func = (_worker[name] for name in ("pi", "reset_func", "step_func",
+                                                                                  "is_terminal_func"))
+    policy.greedy_actions, policy.epsilon = greedy_actions, epsilon
+    states = np.zeros(episodes * max_steps_per_episode, dtype=np.int32)
+    actions = np.zeros(episodes * max_steps_per_episode, dtype=np.int32)
+    rewards = np.zeros(episodes * max_steps_per_episode)
+    lengths = np.zeros(episodes, dtype=np.int64)
+    buffer = TrajectoryBuffer(max_steps_per_episode)
+    offset = 0
+    for episode_id in range(episodes):
+        s_list, a_list, _, r_list = step_until_the_end_of_the_episode_and_generate_trajectory(reset_func(),
+                                                                                              policy,
+                                                                                              step_func,
+                                                                                              is_terminal_func,
+                                                                                              max_steps_per_episode,
+                                                                                              buffer)
+        lengths[episode_id] = len(s_list)
+        states[offset:offset + len(s_list)] = s_list
+        actions[offset:offset + len(s_list)] = a_list
+        rewards[offset:offset + len(s_list)] = r_list
+        offset += len(s_list)
+    return states[:offset], actions[:offset], rewards[:offset], lengths
+
+
+def _parallel_episodes(
+        behaviour_policy: EpsilonGreedyPolicy,
+        reset_func: Callable,
+        step_func: Callable,
+        is_terminal_func: Callable,
+        max_episodes: int,
+        max_steps_per_episode: int,
+        n_jobs: int,
+        sync_interval: int,
+        seed: int = None
+):
+    # Every round, each worker generates sync_interval episodes under one snapshot of the
+    # behaviour policy; episodes are yielded in task order so results do not depend on scheduling.
+    seed_sequence = _seed_sequence(seed)
+    states_count, actions_count = behaviour_policy.shape
+    worker_policy = EpsilonGreedyPolicy(np.zeros((states_count, actions_count)), 1.0,
+                                        np.zeros(states_count, dtype=np.int64))
+    with _worker_pool(n_jobs, worker_policy, reset_func, step_func, is_terminal_func) as executor:
+        remaining = max_episodes
+        while remaining > 0:
+            pi = behaviour_policy.snapshot()
+            counts = [min(sync_interval, remaining - job * sync_interval) for job in range(n_jobs)
+                      if remaining - job * sync_interval > 0]
+            futures = [executor.submit(_trajectory_batch_worker, pi.greedy_actions, pi.epsilon, count,
+                                       max_steps_per_episode, child)
+                       for count, child in zip(counts, seed_sequence.spawn(len(counts)))]
+            for future in futures:
+                states, actions, rewards, lengths = future.result()
+                offsets = np.concatenate(([0], np.cumsum(lengths)))
+                for lo, hi in zip(offsets[:-1], offsets[1:]):
+                    yield states[lo:hi], actions[lo:hi], rewards[lo:hi], pi
+            remaining -= sum(counts)
+
+
+@instrumented
 def first_visit_monte_carlo_prediction(
-        pi: np.ndarray,
+        pi: Union[np.ndarray, TabularPolicy],
         reset_func: Callable,
         step_func: Callable,
         is_terminal_func: Callable,
         max_episodes: int = 1000,
         max_steps_per_episode: int = 10,
         gamma: float = 0.99,
-        exploring_starts: bool = False
+        exploring_starts: bool = False,
+        n_jobs: int = 1,
+        seed: int = None,
+        checkpointer: Checkpointer = None,
+        early_stopping: EarlyStopping = None,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
 ) -> np.ndarray:
+    assert n_jobs > 0
+    assert n_jobs == 1 or (early_stopping is None and checkpointer is None)
+    dtypes = as_dtype_policy(dtypes)
     states_count = pi.shape[0]
     states = np.arange(states_count)
-    V = np.random.random(states_count)
+    V = dtypes.values(np.random.random(states_count))
 
-    for s in states:
-        if is_terminal_func(s):
-            V[s] = 0.0
+    terminal_mask = terminal_mask_of(is_terminal_func, states_count)
+    V[terminal_mask] = 0.0
 
-    returns = np.zeros(states_count)
-    returns_count = np.zeros(states_count)
+    if n_jobs > 1:
+        tasks = np.array_split(np.arange(max_episodes), 4 * n_jobs)
+        seeds = _seed_sequence(seed).spawn(len(tasks))
+        with _worker_pool(n_jobs, pi, reset_func, step_func, is_terminal_func) as executor:
+            results = list(executor.map(_first_visit_prediction_worker,
+                                        *zip(*[(len(task), max_steps_per_episode, gamma, exploring_starts, child)
+                                               for task, child in zip(tasks, seeds)])))
+        returns = np.sum([r for r, _, _ in results], axis=0)
+        returns_count = np.sum([c for _, c, _ in results], axis=0)
+        visited = returns_count > 0
+        V[visited] = returns[visited] / returns_count[visited]
+        if stats is not None:
+            # Steps taken in the workers are not seen by stats.timed_step.
+            for _, _, lengths in results:
+                stats.env_steps += int(np.sum(lengths))
+                for length in lengths:
+                    stats.episode(length)
+        return V
+
+    returns = np.zeros(states_count, dtype=dtypes.value)
+    returns_count = dtypes.counts(states_count)
+
+    first_episode = 0
+    if checkpointer is not None:
+        V = checkpointer.table("V", V)
+        returns = checkpointer.table("returns", returns)
+        returns_count = checkpointer.table("returns_count", returns_count)
+        first_episode = checkpointer.restore()
+
+    if early_stopping is not None:
+        early_stopping.start(V)
+    if stats is not None:
+        step_func = stats.timed_step(step_func)
 
-    for episode_id in range(max_episodes):
+    policy = as_policy(pi)
+    buffer = TrajectoryBuffer(max_steps_per_episode)
+    first_visit = first_visit_scratch(states_count)
+
+    for episode_id in range(first_episode, max_episodes):
         s0 = np.random.choice(states) if exploring_starts else reset_func()
-        s_list, a_list, _, r_list = step_until_the_end_of_the_episode_and_generate_trajectory(s0, pi, step_func,
+        s_list, a_list, _, r_list = step_until_the_end_of_the_episode_and_generate_trajectory(s0, policy,
+                                                                                              step_func,
                                                                                               is_terminal_func,
-                                                                                              max_steps_per_episode)
-        G = 0.0
-        for t in reversed(range(len(s_list))):
-            G = gamma * G + r_list[t]
-            st = s_list[t]
-            if st in s_list[0:t]:
-                continue
-            returns[st] += G
-            returns_count[st] += 1
-            V[st] = returns[st] / returns_count[st]
+                                                                                              max_steps_per_episode,
+                                                                                              buffer)
+        s_first = _first_visit_prediction_update(s_list, r_list, gamma, returns, returns_count, first_visit)
+        V[s_first] = returns[s_first] / returns_count[s_first]
+        if stats is not None:
+            stats.episode(s_list.shape[0])
+        if checkpointer is not None:
+            checkpointer.step(episode_id + 1)
+        if early_stopping is not None and early_stopping.update(s_list.shape[0]):
+            break
+    if checkpointer is not None:
+        checkpointer.save()
+        V = np.array(V)
     return V
 
 
+@instrumented
 def monte_carlo_with_exploring_starts_control(
         states_count: int,
         actions_count: int,
@@ -116,26 +654,45 @@ def monte_carlo_with_exploring_starts_control(
         is_terminal_func: Callable,
         max_episodes: int = 1000,
         max_steps_per_episode: int = 10,
-        gamma: float = 0.99
+        gamma: float = 0.99,
+        checkpointer: Checkpointer = None,
+        early_stopping: EarlyStopping = None,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
 ) -> (np.ndarray, np.ndarray):
-    pi = tabular_random_uniform_policy(states_count, actions_count)
+    dtypes = as_dtype_policy(dtypes)
+    policy = DeterministicPolicy(np.random.randint(actions_count, size=states_count).astype(dtypes.action),
+                                 actions_count)
     states = np.arange(states_count)
     actions = np.arange(actions_count)
 
-    Q = np.random.random((states_count, actions_count))
+    Q = dtypes.values(np.random.random((states_count, actions_count)))
+    terminal_mask = terminal_mask_of(is_terminal_func, states_count)
+    Q[terminal_mask] = 0.0
 
-    for s in states:
-        if is_terminal_func(s):
-            Q[s, :] = 0.0
-            pi[s, :] = 0.0
+    returns = np.zeros((states_count, actions_count), dtype=dtypes.value)
+    returns_count = dtypes.counts((states_count, actions_count))
 
-    returns = np.zeros((states_count, actions_count))
-    returns_count = np.zeros((states_count, actions_count))
+    first_episode = 0
+    if checkpointer is not None:
+        Q = checkpointer.table("Q", Q)
+        returns = checkpointer.table("returns", returns)
+        returns_count = checkpointer.table("returns_count", returns_count)
+        policy.actions = checkpointer.table("actions", policy.actions)
+        first_episode = checkpointer.restore()
 
-    for episode_id in range(max_episodes):
+    if early_stopping is not None:
+        early_stopping.start(Q)
+    if stats is not None:
+        step_func = stats.timed_step(step_func)
+
+    buffer = TrajectoryBuffer(max_steps_per_episode)
+    first_visit = first_visit_scratch(states_count * actions_count)
+
+    for episode_id in range(first_episode, max_episodes):
         s0 = np.random.choice(states)
 
-        if is_terminal_func(s0):
+        if terminal_mask[s0]:
             episode_id -= 1
             continue
 
@@ -143,29 +700,31 @@ def monte_carlo_with_exploring_starts_control(
 
         s1, r1, terminal = step_func(s0, a0)
 
-        s_list, a_list, _, r_list = step_until_the_end_of_the_episode_and_generate_trajectory(s1, pi, step_func,
+        s_list, a_list, _, r_list = step_until_the_end_of_the_episode_and_generate_trajectory(s1, policy,
+                                                                                              step_func,
                                                                                               is_terminal_func,
-                                                                                              max_steps_per_episode)
-        s_list.insert(0, s0)
-        a_list.insert(0, a0)
-        r_list.insert(0, r1)
-
-        G = 0.0
-        for t in reversed(range(len(s_list))):
-            G = gamma * G + r_list[t]
-            st = s_list[t]
-            at = a_list[t]
-            if (st, at) in zip(s_list[0:t], a_list[0:t]):
-                continue
-
-            returns[st, at] += G
-            returns_count[st, at] += 1
-            Q[st, at] = returns[st, at] / returns_count[st, at]
-            pi[st, :] = 0.0
-            pi[st, np.argmax(Q[st, :])] = 1.0
+                                                                                              max_steps_per_episode,
+                                                                                              buffer)
+        buffer.prepend(s0, a0, s1, r1)
+        s_list, a_list, r_list = buffer.states, buffer.actions, buffer.rewards
+
+        s_first = _first_visit_control_update(s_list, a_list, r_list, gamma, Q, returns, returns_count, first_visit)
+        policy.actions[s_first] = np.argmax(Q[s_first, :], axis=1)
+        if stats is not None:
+            stats.episode(s_list.shape[0])
+        if checkpointer is not None:
+            checkpointer.step(episode_id + 1)
+        if early_stopping is not None and early_stopping.update(s_list.shape[0]):
+            break
+    if checkpointer is not None:
+        checkpointer.save()
+        Q = np.array(Q)
+    pi = dtypes.values(policy.to_matrix())
+    pi[terminal_mask, :] = 0.0
     return Q, pi
 
 
+@instrumented
 def on_policy_first_visit_monte_carlo_epsilon_soft_control(
         states_count: int,
         actions_count: int,
@@ -175,45 +734,85 @@ def on_policy_first_visit_monte_carlo_epsilon_soft_control(
         max_episodes: int = 1000,
         max_steps_per_episode: int = 10,
         gamma: float = 0.99,
-        epsilon: float = 0.1
+        epsilon: float = 0.1,
+        n_jobs: int = 1,
+        sync_interval: int = 10,
+        seed: int = None,
+        checkpointer: Checkpointer = None,
+        early_stopping: EarlyStopping = None,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
 ) -> (np.ndarray, np.ndarray):
-    pi = tabular_random_uniform_policy(states_count, actions_count)
-    states = np.arange(states_count)
-    actions = np.arange(actions_count)
+    assert n_jobs > 0
+    assert sync_interval > 0
+    assert n_jobs == 1 or checkpointer is None
+    dtypes = as_dtype_policy(dtypes)
 
-    Q = np.random.random((states_count, actions_count))
+    Q = dtypes.values(np.random.random((states_count, actions_count)))
+    terminal_mask = terminal_mask_of(is_terminal_func, states_count)
+    Q[terminal_mask] = 0.0
 
-    for s in states:
-        if is_terminal_func(s):
-            Q[s, :] = 0.0
-            pi[s, :] = 0.0
+    returns = np.zeros((states_count, actions_count), dtype=dtypes.value)
+    returns_count = dtypes.counts((states_count, actions_count))
 
-    returns = np.zeros((states_count, actions_count))
-    returns_count = np.zeros((states_count, actions_count))
+    first_episode = 0
+    if checkpointer is not None:
+        Q = checkpointer.table("Q", Q)
+        returns = checkpointer.table("returns", returns)
+        returns_count = checkpointer.table("returns_count", returns_count)
+        first_episode = checkpointer.restore()
 
-    for episode_id in range(max_episodes):
-        s0 = reset_func()
+    policy = EpsilonGreedyPolicy(Q, epsilon, dtypes.greedy_actions(Q))
+    if early_stopping is not None:
+        early_stopping.start(Q)
+    first_visit = first_visit_scratch(states_count * actions_count)
 
-        s_list, a_list, _, r_list = step_until_the_end_of_the_episode_and_generate_trajectory(s0, pi, step_func,
-                                                                                              is_terminal_func,
-                                                                                              max_steps_per_episode)
-
-        G = 0.0
-        for t in reversed(range(len(s_list))):
-            G = gamma * G + r_list[t]
-            st = s_list[t]
-            at = a_list[t]
-            if (st, at) in zip(s_list[0:t], a_list[0:t]):
-                continue
-
-            returns[st, at] += G
-            returns_count[st, at] += 1
-            Q[st, at] = returns[st, at] / returns_count[st, at]
-            pi[st, :] = epsilon / actions_count
-            pi[st, np.argmax(Q[st, :])] = 1.0 - epsilon + epsilon / actions_count
+    if n_jobs > 1:
+        for s_list, a_list, r_list, _ in _parallel_episodes(policy, reset_func, step_func,
+                                                            is_terminal_func, max_episodes, max_steps_per_episode,
+                                                            n_jobs, sync_interval, seed):
+            s_first = _first_visit_control_update(s_list, a_list, r_list, gamma, Q, returns, returns_count,
+                                                  first_visit)
+            policy.update(s_first)
+            if stats is not None:
+                # Steps taken in the workers are not seen by stats.timed_step.
+                stats.env_steps += s_list.shape[0]
+                stats.episode(s_list.shape[0])
+            if early_stopping is not None and early_stopping.update(s_list.shape[0]):
+                break
+    else:
+        if stats is not None:
+            step_func = stats.timed_step(step_func)
+        buffer = TrajectoryBuffer(max_steps_per_episode)
+
+        for episode_id in range(first_episode, max_episodes):
+            s0 = reset_func()
+
+            s_list, a_list, _, r_list = step_until_the_end_of_the_episode_and_generate_trajectory(s0, policy,
+                                                                                                  step_func,
+                                                                                                  is_terminal_func,
+                                                                                                  max_steps_per_episode,
+                                                                                                  buffer)
+
+            s_first = _first_visit_control_update(s_list, a_list, r_list, gamma, Q, returns, returns_count,
+                                                  first_visit)
+            policy.update(s_first)
+            if stats is not None:
+                stats.episode(s_list.shape[0])
+            if checkpointer is not None:
+                checkpointer.step(episode_id + 1)
+            if early_stopping is not None and early_stopping.update(s_list.shape[0]):
+                break
+        if checkpointer is not None:
+            checkpointer.save()
+            Q = np.array(Q)
+
+    pi = dtypes.values(policy.to_matrix())
+    pi[terminal_mask, :] = 0.0
     return Q, pi
 
 
+@instrumented
 def off_policy_monte_carlo_control(
         states_count: int,
         actions_count: int,
@@ -224,85 +823,137 @@ def off_policy_monte_carlo_control(
         max_steps_per_episode: int = 10,
         gamma: float = 0.99,
         epsilon: float = 0.1,
-        epsilon_greedy_behaviour_policy: bool = False
+        epsilon_greedy_behaviour_policy: bool = False,
+        n_jobs: int = 1,
+        sync_interval: int = 10,
+        seed: int = None,
+        checkpointer: Checkpointer = None,
+        early_stopping: EarlyStopping = None,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
 ) -> (np.ndarray, np.ndarray):
-    b = tabular_random_uniform_policy(states_count, actions_count)
-    pi = tabular_random_uniform_policy(states_count, actions_count)
-    states = np.arange(states_count)
+    assert n_jobs > 0
+    assert sync_interval > 0
+    assert n_jobs == 1 or checkpointer is None
+    dtypes = as_dtype_policy(dtypes)
 
-    Q = np.random.random((states_count, actions_count))
+    Q = dtypes.values(np.random.random((states_count, actions_count)))
 
-    for s in states:
-        if is_terminal_func(s):
-            Q[s, :] = 0.0
-            pi[s, :] = 0.0
-        pi[s, :] = 0
-        pi[s, np.argmax(Q[s, :])] = 1.0
+    terminal_mask = terminal_mask_of(is_terminal_func, states_count)
+    Q[terminal_mask] = 0.0
+    C = np.zeros((states_count, actions_count), dtype=dtypes.value)
 
-    C = np.zeros((states_count, actions_count))
+    first_episode = 0
+    if checkpointer is not None:
+        Q = checkpointer.table("Q", Q)
+        C = checkpointer.table("C", C)
+        first_episode = checkpointer.restore()
 
-    for episode_id in range(max_episodes):
-        if epsilon_greedy_behaviour_policy:
-            for s in states:
-                b[s, :] = epsilon / actions_count
-                b[s, np.argmax(Q[s, :])] = 1.0 - epsilon + epsilon / actions_count
+    # Both policies live in one cache of greedy actions: the target policy is greedy and the
+    # behaviour policy is epsilon-greedy over it (uniform random when epsilon is 1).
+    behaviour = EpsilonGreedyPolicy(Q, epsilon if epsilon_greedy_behaviour_policy else 1.0,
+                                    dtypes.greedy_actions(Q))
+    greedy_actions = behaviour.greedy_actions
+    if early_stopping is not None:
+        early_stopping.start(Q)
 
-        s0 = reset_func()
+    if n_jobs > 1:
+        for s_list, a_list, r_list, snapshot in _parallel_episodes(behaviour, reset_func, step_func,
+                                                                   is_terminal_func, max_episodes,
+                                                                   max_steps_per_episode, n_jobs, sync_interval,
+                                                                   seed):
+            _off_policy_episode_update(s_list, a_list, r_list, gamma, Q, C, greedy_actions,
+                                       snapshot.probs(s_list, a_list))
+            if stats is not None:
+                stats.env_steps += s_list.shape[0]
+                stats.episode(s_list.shape[0])
+            if early_stopping is not None and early_stopping.update(s_list.shape[0]):
+                break
+    else:
+        if stats is not None:
+            step_func = stats.timed_step(step_func)
+        buffer = TrajectoryBuffer(max_steps_per_episode)
 
-        s_list, a_list, _, r_list = step_until_the_end_of_the_episode_and_generate_trajectory(s0, b, step_func,
-                                                                                              is_terminal_func,
-                                                                                              max_steps_per_episode)
-
-        G = 0.0
-        W = 1
-        for t in reversed(range(len(s_list))):
-            G = gamma * G + r_list[t]
-            st = s_list[t]
-            at = a_list[t]
-            C[st, at] += W
-
-            Q[st, at] += W / C[st, at] * (G - Q[st, at])
-            pi[st, :] = 0
-            pi[st, np.argmax(Q[st, :])] = 1.0
-            if np.argmax(Q[st, :]) != at:
+        for episode_id in range(first_episode, max_episodes):
+            s0 = reset_func()
+
+            s_list, a_list, _, r_list = step_until_the_end_of_the_episode_and_generate_trajectory(s0, behaviour,
+                                                                                                  step_func,
+                                                                                                  is_terminal_func,
+                                                                                                  max_steps_per_episode,
+                                                                                                  buffer)
+
+            _off_policy_episode_update(s_list, a_list, r_list, gamma, Q, C, greedy_actions,
+                                       behaviour.probs(s_list, a_list))
+            if stats is not None:
+                stats.episode(s_list.shape[0])
+            if checkpointer is not None:
+                checkpointer.step(episode_id + 1)
+            if early_stopping is not None and early_stopping.update(s_list.shape[0]):
                 break
-            W = W / b[st, at]
-    return Q, pi
+        if checkpointer is not None:
+            checkpointer.save()
+            Q = np.array(Q)
+
+    return Q, dtypes.values(DeterministicPolicy(greedy_actions, actions_count).to_matrix())
 
 
+@instrumented
 def tabular_td_zero_prediction(
-        pi: np.ndarray,
+        pi: Union[np.ndarray, TabularPolicy],
         reset_func: Callable,
         step_func: Callable,
         is_terminal_func: Callable,
         max_episodes: int = 1000,
         max_steps_per_episode: int = 10,
         gamma: float = 0.99,
-        alpha: float = 0.1
+        alpha: float = 0.1,
+        checkpointer: Checkpointer = None,
+        early_stopping: EarlyStopping = None,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
 ) -> np.ndarray:
-    states_count = pi.shape[0]
-    actions_count = pi.shape[1]
+    dtypes = as_dtype_policy(dtypes)
+    policy = as_policy(pi)
+    states_count = policy.states_count
 
-    states = np.arange(states_count)
-    actions = np.arange(actions_count)
-    V = np.random.random(states_count)
+    V = dtypes.values(np.random.random(states_count))
 
-    for s in states:
-        if is_terminal_func(s):
-            V[s] = 0.0
+    terminal_mask = terminal_mask_of(is_terminal_func, states_count)
+    V[terminal_mask] = 0.0
 
-    for episode_id in range(max_episodes):
+    first_episode = 0
+    if checkpointer is not None:
+        V = checkpointer.table("V", V)
+        first_episode = checkpointer.restore()
+
+    if early_stopping is not None:
+        early_stopping.start(V)
+    if stats is not None:
+        step_func = stats.timed_step(step_func)
+
+    for episode_id in range(first_episode, max_episodes):
         s = reset_func()
         step = 0
-        while not is_terminal_func(s) and step < max_steps_per_episode:
-            a = np.random.choice(actions, p=pi[s])
+        while not terminal_mask[s] and step < max_steps_per_episode:
+            a = policy.sample(s)
             (s_p, r, t) = step_func(s, a)
             V[s] += alpha * (r + gamma * V[s_p] - V[s])
             s = s_p
             step += 1
+        if stats is not None:
+            stats.episode(step)
+        if checkpointer is not None:
+            checkpointer.step(episode_id + 1)
+        if early_stopping is not None and early_stopping.update(step):
+            break
+    if checkpointer is not None:
+        checkpointer.save()
+        V = np.array(V)
     return V
 
 
+@instrumented
 def tabular_sarsa_control(
         states_count: int,
         actions_count: int,
@@ -313,43 +964,73 @@ def tabular_sarsa_control(
         max_steps_per_episode: int = 10,
         gamma: float = 0.99,
         alpha: float = 0.01,
-        epsilon: float = 0.75
+        epsilon: float = 0.75,
+        env: VectorEnv = None,
+        backend: str = "python",
+        rng: np.random.Generator = None,
+        checkpointer: Checkpointer = None,
+        early_stopping: EarlyStopping = None,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
 ) -> (np.ndarray, np.ndarray):
-    states = np.arange(states_count)
-    actions = np.arange(actions_count)
+    # With rng, Q, the policy's uniforms and the compiled loops' seed all come from it instead of np.random;
+    # pass an env built with the same rng to take the transitions from it too.
+    assert rng is None or checkpointer is None
+    dtypes = as_dtype_policy(dtypes)
+    Q = dtypes.values((np.random if rng is None else rng).random((states_count, actions_count)))
+    terminal_mask = terminal_mask_of(is_terminal_func, states_count)
+    Q[terminal_mask] = 0.0
+
+    first_episode = 0
+    if checkpointer is not None:
+        Q = checkpointer.table("Q", Q)
+        first_episode = checkpointer.restore()
 
-    Q = np.random.random((states_count, actions_count))
-    pi = np.random.random((states_count, actions_count))
+    # The compiled loops always run every episode at once, so early stopping and checkpoints go
+    # through the Python one.
+    if use_numba(backend, env, reset_func, step_func, is_terminal_func) and early_stopping is None and \
+            checkpointer is None:
+        steps = sarsa_kernel(*compiled_arrays(env), Q, max_episodes, max_steps_per_episode, gamma, alpha,
+                             epsilon, kernel_seed(rng))
+        if stats is not None:
+            stats.episodes += max_episodes
+            stats.env_steps += steps
+        return Q, dtypes.values(EpsilonGreedyPolicy(Q, epsilon).to_matrix())
 
-    for s in states:
-        if is_terminal_func(s):
-            Q[s, :] = 0.
-            pi[s, :] = 0.
+    policy = EpsilonGreedyPolicy(Q, epsilon, dtypes.greedy_actions(Q), UniformStream(rng=rng))
 
-    for episode_id in range(max_episodes):
+    if early_stopping is not None:
+        early_stopping.start(Q)
+    if stats is not None:
+        step_func = stats.timed_step(step_func)
+
+    for episode_id in range(first_episode, max_episodes):
         s = reset_func()
         step = 0
-        rdm = np.random.random()
-        a = np.random.choice(actions) if rdm < epsilon else np.argmax(Q[s, :])
+        a = policy.sample(s)
 
-        while not is_terminal_func(s) and step < max_steps_per_episode:
+        while not terminal_mask[s] and step < max_steps_per_episode:
             (s_p, r, t) = step_func(s, a)
-            rdm = np.random.random()
-            a_p = np.random.choice(actions) if rdm < epsilon else np.argmax(Q[s_p, :])
+            a_p = policy.sample(s_p)
             Q[s, a] += alpha * (r + gamma * Q[s_p, a_p] - Q[s, a])
+            policy.update(s)
             s = s_p
             a = a_p
             step += 1
+        if stats is not None:
+            stats.episode(step)
+        if checkpointer is not None:
+            checkpointer.step(episode_id + 1)
+        if early_stopping is not None and early_stopping.update(step):
+            break
+    if checkpointer is not None:
+        checkpointer.save()
+        Q = np.array(Q)
 
-    for s in states:
-        if is_terminal_func(s):
-            pi[s, :] = 0.
-        pi[s, :] = epsilon / actions_count
-        pi[s, np.argmax(Q[s, :])] = 1 - epsilon + epsilon / actions_count
-
-    return Q, pi
+    return Q, dtypes.values(policy.to_matrix())
 
 
+@instrumented
 def tabular_q_learning_control(
         states_count: int,
         actions_count: int,
@@ -360,35 +1041,874 @@ def tabular_q_learning_control(
         max_steps_per_episode: int = 10,
         gamma: float = 0.99,
         alpha: float = 0.01,
-        epsilon: float = 0.75
+        epsilon: float = 0.75,
+        env: VectorEnv = None,
+        backend: str = "python",
+        rng: np.random.Generator = None,
+        checkpointer: Checkpointer = None,
+        early_stopping: EarlyStopping = None,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
 ) -> (np.ndarray, np.ndarray):
-    states = np.arange(states_count)
-    actions = np.arange(actions_count)
+    # With rng, Q, the policy's uniforms and the compiled loops' seed all come from it instead of np.random;
+    # pass an env built with the same rng to take the transitions from it too.
+    assert rng is None or checkpointer is None
+    dtypes = as_dtype_policy(dtypes)
+    Q = dtypes.values((np.random if rng is None else rng).random((states_count, actions_count)))
+    terminal_mask = terminal_mask_of(is_terminal_func, states_count)
+    Q[terminal_mask] = 0.0
+
+    first_episode = 0
+    if checkpointer is not None:
+        Q = checkpointer.table("Q", Q)
+        first_episode = checkpointer.restore()
+
+    # The compiled loops always run every episode at once, so early stopping and checkpoints go
+    # through the Python one.
+    if use_numba(backend, env, reset_func, step_func, is_terminal_func) and early_stopping is None and \
+            checkpointer is None:
+        steps = q_learning_kernel(*compiled_arrays(env), Q, max_episodes, max_steps_per_episode, gamma, alpha,
+                                  epsilon, kernel_seed(rng))
+        if stats is not None:
+            stats.episodes += max_episodes
+            stats.env_steps += steps
+        return Q, dtypes.values(DeterministicPolicy(np.argmax(Q, axis=1), actions_count).to_matrix())
 
-    Q = np.random.random((states_count, actions_count))
-    pi = np.random.random((states_count, actions_count))
+    policy = EpsilonGreedyPolicy(Q, epsilon, dtypes.greedy_actions(Q), UniformStream(rng=rng))
 
-    for s in states:
-        if is_terminal_func(s):
-            Q[s, :] = 0.
-            pi[s, :] = 0.
+    if early_stopping is not None:
+        early_stopping.start(Q)
+    if stats is not None:
+        step_func = stats.timed_step(step_func)
 
-    for episode_id in range(max_episodes):
+    for episode_id in range(first_episode, max_episodes):
         s = reset_func()
         step = 0
 
-        while not is_terminal_func(s) and step < max_steps_per_episode:
-            rdm = np.random.random()
-            a = np.random.choice(actions) if rdm < epsilon else np.argmax(Q[s, :])
+        while not terminal_mask[s] and step < max_steps_per_episode:
+            a = policy.sample(s)
             (s_p, r, t) = step_func(s, a)
             Q[s, a] += alpha * (r + gamma * np.max(Q[s_p, :]) - Q[s, a])
+            policy.update(s)
             s = s_p
             step += 1
+        if stats is not None:
+            stats.episode(step)
+        if checkpointer is not None:
+            checkpointer.step(episode_id + 1)
+        if early_stopping is not None and early_stopping.update(step):
+            break
+    if checkpointer is not None:
+        checkpointer.save()
+        Q = np.array(Q)
 
-    for s in states:
-        if is_terminal_func(s):
-            pi[s, :] = 0.
-        pi[s, :] = 0.0
-        pi[s, np.argmax(Q[s, :])] = 1.0
+    return Q, dtypes.values(DeterministicPolicy(policy.greedy_actions, actions_count).to_matrix())
 
-    return Q, pi
+
+def _n_step_return(
+        rewards: np.ndarray,
+        tau: int,
+        end: int,
+        gamma: float,
+        bootstrap: float
+) -> float:
+    # R_{tau+1} + gamma R_{tau+2} + ... + gamma^(end-tau-1) R_end + gamma^(end-tau) bootstrap, with the
+    # rewards of an episode kept in a ring of rewards.shape[0] slots indexed by time step.
+    m = rewards.shape[0]
+    G = bootstrap
+    for i in range(end, tau, -1):
+        G = rewards[i % m] + gamma * G
+    return G
+
+
+@instrumented
+def tabular_n_step_td_prediction(
+        pi: Union[np.ndarray, TabularPolicy],
+        reset_func: Callable,
+        step_func: Callable,
+        is_terminal_func: Callable,
+        n: int = 4,
+        max_episodes: int = 1000,
+        max_steps_per_episode: int = 10,
+        gamma: float = 0.99,
+        alpha: float = 0.1,
+        checkpointer: Checkpointer = None,
+        early_stopping: EarlyStopping = None,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
+) -> np.ndarray:
+    assert n > 0
+    dtypes = as_dtype_policy(dtypes)
+    policy = as_policy(pi)
+    states_count = policy.states_count
+
+    V = dtypes.values(np.random.random(states_count))
+
+    terminal_mask = terminal_mask_of(is_terminal_func, states_count)
+    V[terminal_mask] = 0.0
+
+    first_episode = 0
+    if checkpointer is not None:
+        V = checkpointer.table("V", V)
+        first_episode = checkpointer.restore()
+
+    if early_stopping is not None:
+        early_stopping.start(V)
+    if stats is not None:
+        step_func = stats.timed_step(step_func)
+
+    # S_t and R_t of the last n + 1 time steps, at index t % (n + 1).
+    states = np.zeros(n + 1, dtype=np.int64)
+    rewards = np.zeros(n + 1)
+
+    for episode_id in range(first_episode, max_episodes):
+        s = reset_func()
+        states[0] = s
+        # T is the step the episode ends at; truncated episodes bootstrap from their last state
+        # like any other n-step return, terminal ones get V[terminal] = 0.
+        T = 0 if terminal_mask[s] else max_steps_per_episode
+        t = 0
+        while True:
+            if t < T:
+                s = states[t % (n + 1)]
+                (s_p, r, _) = step_func(s, policy.sample(s))
+                states[(t + 1) % (n + 1)] = s_p
+                rewards[(t + 1) % (n + 1)] = r
+                if terminal_mask[s_p]:
+                    T = t + 1
+            tau = t - n + 1
+            if tau >= 0:
+                end = min(tau + n, T)
+                s_tau = states[tau % (n + 1)]
+                G = _n_step_return(rewards, tau, end, gamma, V[states[end % (n + 1)]])
+                V[s_tau] += alpha * (G - V[s_tau])
+            if tau >= T - 1:
+                break
+            t += 1
+        if stats is not None:
+            stats.episode(T)
+        if checkpointer is not None:
+            checkpointer.step(episode_id + 1)
+        if early_stopping is not None and early_stopping.update(T):
+            break
+    if checkpointer is not None:
+        checkpointer.save()
+        V = np.array(V)
+    return V
+
+
+@instrumented
+def tabular_n_step_sarsa_control(
+        states_count: int,
+        actions_count: int,
+        reset_func: Callable,
+        step_func: Callable,
+        is_terminal_func: Callable,
+        n: int = 4,
+        max_episodes: int = 10000,
+        max_steps_per_episode: int = 10,
+        gamma: float = 0.99,
+        alpha: float = 0.01,
+        epsilon: float = 0.75,
+        checkpointer: Checkpointer = None,
+        early_stopping: EarlyStopping = None,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
+) -> (np.ndarray, np.ndarray):
+    assert n > 0
+    dtypes = as_dtype_policy(dtypes)
+    Q = dtypes.values(np.random.random((states_count, actions_count)))
+    terminal_mask = terminal_mask_of(is_terminal_func, states_count)
+    Q[terminal_mask] = 0.0
+
+    first_episode = 0
+    if checkpointer is not None:
+        Q = checkpointer.table("Q", Q)
+        first_episode = checkpointer.restore()
+
+    policy = EpsilonGreedyPolicy(Q, epsilon, dtypes.greedy_actions(Q))
+
+    if early_stopping is not None:
+        early_stopping.start(Q)
+    if stats is not None:
+        step_func = stats.timed_step(step_func)
+
+    # S_t, A_t and R_t of the last n + 1 time steps, at index t % (n + 1).
+    states = np.zeros(n + 1, dtype=np.int64)
+    actions = np.zeros(n + 1, dtype=np.int64)
+    rewards = np.zeros(n + 1)
+
+    for episode_id in range(first_episode, max_episodes):
+        s = reset_func()
+        states[0] = s
+        actions[0] = policy.sample(s)
+        T = 0 if terminal_mask[s] else max_steps_per_episode
+        t = 0
+        while True:
+            if t < T:
+                (s_p, r, _) = step_func(states[t % (n + 1)], actions[t % (n + 1)])
+                states[(t + 1) % (n + 1)] = s_p
+                rewards[(t + 1) % (n + 1)] = r
+                # The action taken next is also what a return truncated at s_p bootstraps from.
+                actions[(t + 1) % (n + 1)] = policy.sample(s_p)
+                if terminal_mask[s_p]:
+                    T = t + 1
+            tau = t - n + 1
+            if tau >= 0:
+                end = min(tau + n, T)
+                s_tau, a_tau = states[tau % (n + 1)], actions[tau % (n + 1)]
+                G = _n_step_return(rewards, tau, end, gamma, Q[states[end % (n + 1)], actions[end % (n + 1)]])
+                Q[s_tau, a_tau] += alpha * (G - Q[s_tau, a_tau])
+                policy.update(s_tau)
+            if tau >= T - 1:
+                break
+            t += 1
+        if stats is not None:
+            stats.episode(T)
+        if checkpointer is not None:
+            checkpointer.step(episode_id + 1)
+        if early_stopping is not None and early_stopping.update(T):
+            break
+    if checkpointer is not None:
+        checkpointer.save()
+        Q = np.array(Q)
+
+    return Q, dtypes.values(policy.to_matrix())
+
+
+@instrumented
+def tabular_td_lambda_prediction(
+        pi: Union[np.ndarray, TabularPolicy],
+        reset_func: Callable,
+        step_func: Callable,
+        is_terminal_func: Callable,
+        lambda_: float = 0.9,
+        max_episodes: int = 1000,
+        max_steps_per_episode: int = 10,
+        gamma: float = 0.99,
+        alpha: float = 0.1,
+        trace: str = "accumulating",
+        trace_threshold: float = 1e-4,
+        checkpointer: Checkpointer = None,
+        early_stopping: EarlyStopping = None,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
+) -> np.ndarray:
+    assert 0 <= lambda_ <= 1
+    assert trace in ("accumulating", "replacing")
+    dtypes = as_dtype_policy(dtypes)
+    policy = as_policy(pi)
+    states_count = policy.states_count
+
+    V = dtypes.values(np.random.random(states_count))
+
+    terminal_mask = terminal_mask_of(is_terminal_func, states_count)
+    V[terminal_mask] = 0.0
+
+    first_episode = 0
+    if checkpointer is not None:
+        V = checkpointer.table("V", V)
+        first_episode = checkpointer.restore()
+
+    if early_stopping is not None:
+        early_stopping.start(V)
+    if stats is not None:
+        step_func = stats.timed_step(step_func)
+
+    traces = SparseTraces(states_count, trace_threshold)
+    replacing = trace == "replacing"
+
+    for episode_id in range(first_episode, max_episodes):
+        s = reset_func()
+        step = 0
+        traces.clear()
+        while not terminal_mask[s] and step < max_steps_per_episode:
+            a = policy.sample(s)
+            (s_p, r, t) = step_func(s, a)
+            traces.visit(s, replacing)
+            traces.add_to(V, alpha * (r + gamma * V[s_p] - V[s]))
+            traces.decay(gamma * lambda_)
+            s = s_p
+            step += 1
+        if stats is not None:
+            stats.episode(step)
+        if checkpointer is not None:
+            checkpointer.step(episode_id + 1)
+        if early_stopping is not None and early_stopping.update(step):
+            break
+    if checkpointer is not None:
+        checkpointer.save()
+        V = np.array(V)
+    return V
+
+
+@instrumented
+def tabular_sarsa_lambda_control(
+        states_count: int,
+        actions_count: int,
+        reset_func: Callable,
+        step_func: Callable,
+        is_terminal_func: Callable,
+        lambda_: float = 0.9,
+        max_episodes: int = 10000,
+        max_steps_per_episode: int = 10,
+        gamma: float = 0.99,
+        alpha: float = 0.01,
+        epsilon: float = 0.75,
+        trace: str = "accumulating",
+        trace_threshold: float = 1e-4,
+        checkpointer: Checkpointer = None,
+        early_stopping: EarlyStopping = None,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
+) -> (np.ndarray, np.ndarray):
+    assert 0 <= lambda_ <= 1
+    assert trace in ("accumulating", "replacing")
+    dtypes = as_dtype_policy(dtypes)
+    Q = dtypes.values(np.random.random((states_count, actions_count)))
+    terminal_mask = terminal_mask_of(is_terminal_func, states_count)
+    Q[terminal_mask] = 0.0
+
+    first_episode = 0
+    if checkpointer is not None:
+        Q = checkpointer.table("Q", Q)
+        first_episode = checkpointer.restore()
+
+    policy = EpsilonGreedyPolicy(Q, epsilon, dtypes.greedy_actions(Q))
+
+    if early_stopping is not None:
+        early_stopping.start(Q)
+    if stats is not None:
+        step_func = stats.timed_step(step_func)
+
+    traces = SparseTraces(states_count * actions_count, trace_threshold)
+    replacing = trace == "replacing"
+
+    for episode_id in range(first_episode, max_episodes):
+        s = reset_func()
+        step = 0
+        a = policy.sample(s)
+        traces.clear()
+
+        while not terminal_mask[s] and step < max_steps_per_episode:
+            (s_p, r, t) = step_func(s, a)
+            a_p = policy.sample(s_p)
+            traces.visit(int(s) * actions_count + int(a), replacing)
+            traces.add_to(Q, alpha * (r + gamma * Q[s_p, a_p] - Q[s, a]))
+            policy.update(traces.active_keys // actions_count)
+            traces.decay(gamma * lambda_)
+            s = s_p
+            a = a_p
+            step += 1
+        if stats is not None:
+            stats.episode(step)
+        if checkpointer is not None:
+            checkpointer.step(episode_id + 1)
+        if early_stopping is not None and early_stopping.update(step):
+            break
+    if checkpointer is not None:
+        checkpointer.save()
+        Q = np.array(Q)
+
+    return Q, dtypes.values(policy.to_matrix())
+
+
+@instrumented
+def tabular_watkins_q_lambda_control(
+        states_count: int,
+        actions_count: int,
+        reset_func: Callable,
+        step_func: Callable,
+        is_terminal_func: Callable,
+        lambda_: float = 0.9,
+        max_episodes: int = 10000,
+        max_steps_per_episode: int = 10,
+        gamma: float = 0.99,
+        alpha: float = 0.01,
+        epsilon: float = 0.75,
+        trace: str = "accumulating",
+        trace_threshold: float = 1e-4,
+        checkpointer: Checkpointer = None,
+        early_stopping: EarlyStopping = None,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
+) -> (np.ndarray, np.ndarray):
+    assert 0 <= lambda_ <= 1
+    assert trace in ("accumulating", "replacing")
+    dtypes = as_dtype_policy(dtypes)
+    Q = dtypes.values(np.random.random((states_count, actions_count)))
+    terminal_mask = terminal_mask_of(is_terminal_func, states_count)
+    Q[terminal_mask] = 0.0
+
+    first_episode = 0
+    if checkpointer is not None:
+        Q = checkpointer.table("Q", Q)
+        first_episode = checkpointer.restore()
+
+    policy = EpsilonGreedyPolicy(Q, epsilon, dtypes.greedy_actions(Q))
+
+    if early_stopping is not None:
+        early_stopping.start(Q)
+    if stats is not None:
+        step_func = stats.timed_step(step_func)
+
+    traces = SparseTraces(states_count * actions_count, trace_threshold)
+    replacing = trace == "replacing"
+
+    for episode_id in range(first_episode, max_episodes):
+        s = reset_func()
+        step = 0
+        a = policy.sample(s)
+        traces.clear()
+
+        while not terminal_mask[s] and step < max_steps_per_episode:
+            (s_p, r, t) = step_func(s, a)
+            a_p = policy.sample(s_p)
+            # An exploratory next action ends the greedy path the traces follow, unless it ties with the greedy one.
+            a_star = a_p if Q[s_p, a_p] == Q[s_p, policy.greedy_actions[s_p]] else policy.greedy_actions[s_p]
+            traces.visit(int(s) * actions_count + int(a), replacing)
+            traces.add_to(Q, alpha * (r + gamma * Q[s_p, a_star] - Q[s, a]))
+            policy.update(traces.active_keys // actions_count)
+            if a_p == a_star:
+                traces.decay(gamma * lambda_)
+            else:
+                traces.clear()
+            s = s_p
+            a = a_p
+            step += 1
+        if stats is not None:
+            stats.episode(step)
+        if checkpointer is not None:
+            checkpointer.step(episode_id + 1)
+        if early_stopping is not None and early_stopping.update(step):
+            break
+    if checkpointer is not None:
+        checkpointer.save()
+        Q = np.array(Q)
+
+    return Q, dtypes.values(DeterministicPolicy(policy.greedy_actions, actions_count).to_matrix())
+
+
+# Added to every |TD error| used as a replay priority, so no stored transition stops being sampled.
+PRIORITY_OFFSET = 1e-3
+
+
+def _dyna_planning_update(
+        Q: np.ndarray,
+        policy: EpsilonGreedyPolicy,
+        buffer: ReplayBuffer,
+        planning_steps: int,
+        gamma: float,
+        alpha: float,
+        prioritized: bool
+) -> None:
+    # All planning_steps backups are computed from the same Q and applied at once; a pair drawn
+    # several times gets the mean of its updates.
+    i = buffer.sample(planning_steps, prioritized)
+    s, a = buffer.states[i], buffer.actions[i]
+    deltas = buffer.rewards[i] + gamma * np.max(Q[buffer.next_states[i]], axis=1) - Q[s, a]
+    scatter_update(Q, s.astype(np.int64) * Q.shape[1] + a, deltas, alpha, "mean")
+    policy.update(s)
+    if prioritized:
+        buffer.priorities[i] = np.abs(deltas) + PRIORITY_OFFSET
+
+
+@instrumented
+def dyna_q_control(
+        states_count: int,
+        actions_count: int,
+        reset_func: Callable,
+        step_func: Callable,
+        is_terminal_func: Callable,
+        max_episodes: int = 1000,
+        max_steps_per_episode: int = 10,
+        gamma: float = 0.99,
+        alpha: float = 0.1,
+        epsilon: float = 0.1,
+        planning_steps: int = 10,
+        buffer_capacity: int = 10000,
+        model: str = "buffer",
+        sampling: str = "uniform",
+        checkpointer: Checkpointer = None,
+        early_stopping: EarlyStopping = None,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
+) -> (np.ndarray, np.ndarray):
+    assert planning_steps >= 0
+    assert model in ("buffer", "last")
+    assert sampling in ("uniform", "prioritized")
+    dtypes = as_dtype_policy(dtypes)
+    Q = dtypes.values(np.random.random((states_count, actions_count)))
+    terminal_mask = terminal_mask_of(is_terminal_func, states_count)
+    Q[terminal_mask] = 0.0
+
+    # With model="buffer" planning replays the last buffer_capacity transitions as they were seen,
+    # which keeps the outcome frequencies of a stochastic environment. With model="last" each
+    # (s, a) owns one slot holding the last reward and next state observed after it, the learned
+    # model of tabular Dyna-Q; slot_of_key maps s * actions_count + a to that slot.
+    buffer = ReplayBuffer(buffer_capacity)
+    slot_of_key = np.full(states_count * actions_count, -1, dtype=np.int64) if model == "last" else None
+    prioritized = sampling == "prioritized"
+
+    first_episode = 0
+    if checkpointer is not None:
+        Q = checkpointer.table("Q", Q)
+        # The buffer is part of the state a resumed run needs, down to its write position and size.
+        for name in ("states", "actions", "rewards", "next_states", "priorities"):
+            setattr(buffer, name, checkpointer.table("buffer_" + name, getattr(buffer, name)))
+        cursor = checkpointer.table("buffer_cursor", np.zeros(2, dtype=np.int64))
+        if slot_of_key is not None:
+            slot_of_key = checkpointer.table("slot_of_key", slot_of_key)
+        first_episode = checkpointer.restore()
+        buffer.position, buffer.size = int(cursor[0]), int(cursor[1])
+
+    policy = EpsilonGreedyPolicy(Q, epsilon, dtypes.greedy_actions(Q))
+
+    if early_stopping is not None:
+        early_stopping.start(Q)
+    if stats is not None:
+        step_func = stats.timed_step(step_func)
+
+    for episode_id in range(first_episode, max_episodes):
+        s = reset_func()
+        step = 0
+
+        while not terminal_mask[s] and step < max_steps_per_episode:
+            a = policy.sample(s)
+            (s_p, r, t) = step_func(s, a)
+            delta = r + gamma * np.max(Q[s_p, :]) - Q[s, a]
+            Q[s, a] += alpha * delta
+            policy.update(s)
+
+            priority = abs(delta) + PRIORITY_OFFSET
+            if slot_of_key is None:
+                buffer.add(s, a, r, s_p, priority)
+            else:
+                key = int(s) * actions_count + int(a)
+                if slot_of_key[key] >= 0:
+                    buffer.write(slot_of_key[key], s, a, r, s_p, priority)
+                else:
+                    if len(buffer) == buffer.capacity:
+                        evicted = buffer.position
+                        slot_of_key[int(buffer.states[evicted]) * actions_count + int(buffer.actions[evicted])] = -1
+                    slot_of_key[key] = buffer.add(s, a, r, s_p, priority)
+
+            if planning_steps > 0:
+                _dyna_planning_update(Q, policy, buffer, planning_steps, gamma, alpha, prioritized)
+                if stats is not None:
+                    stats.backups += planning_steps
+            s = s_p
+            step += 1
+        if stats is not None:
+            stats.episode(step)
+        if checkpointer is not None:
+            cursor[:] = (buffer.position, buffer.size)
+            checkpointer.step(episode_id + 1)
+        if early_stopping is not None and early_stopping.update(step):
+            break
+    if checkpointer is not None:
+        checkpointer.save()
+        Q = np.array(Q)
+
+    return Q, dtypes.values(DeterministicPolicy(policy.greedy_actions, actions_count).to_matrix())
+
+
+def _end_batched_episodes(
+        next_states: np.ndarray,
+        dones: np.ndarray,
+        steps: np.ndarray,
+        reset_func: Callable,
+        max_steps_per_episode: int,
+        stats: Stats = None
+) -> int:
+    # Copies that hit max_steps_per_episode are reset here; terminal ones were already reset by step_func.
+    steps += 1
+    truncated = (steps >= max_steps_per_episode) & ~dones
+    if np.any(truncated):
+        next_states[truncated] = reset_func(np.count_nonzero(truncated))
+    ended = dones | truncated
+    if stats is not None:
+        for length in steps[ended]:
+            stats.episode(length)
+    steps[ended] = 0
+    return np.count_nonzero(ended)
+
+
+@instrumented
+def batched_tabular_td_zero_prediction(
+        pi: Union[np.ndarray, TabularPolicy],
+        reset_func: Callable,
+        step_func: Callable,
+        is_terminal_func: Callable,
+        n_envs: int = 64,
+        max_episodes: int = 1000,
+        max_steps_per_episode: int = 10,
+        gamma: float = 0.99,
+        alpha: float = 0.1,
+        duplicates: str = "serial",
+        checkpointer: Checkpointer = None,
+        early_stopping: EarlyStopping = None,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
+) -> np.ndarray:
+    assert n_envs > 0
+    dtypes = as_dtype_policy(dtypes)
+    policy = as_policy(pi)
+    states_count = policy.states_count
+
+    V = dtypes.values(np.random.random(states_count))
+    V[terminal_mask_of(is_terminal_func, states_count)] = 0.0
+
+    states = reset_func(n_envs)
+    steps = np.zeros(n_envs, dtype=np.int64)
+    episodes = 0
+    if checkpointer is not None:
+        # The copies are snapshotted mid-episode, so their states and step counts go with V.
+        V = checkpointer.table("V", V)
+        states = checkpointer.table("states", states)
+        steps = checkpointer.table("steps", steps)
+        episodes = checkpointer.restore()
+
+    if early_stopping is not None:
+        early_stopping.start(V)
+    if stats is not None:
+        step_func = stats.timed_step(step_func)
+
+    while episodes < max_episodes:
+        actions = policy.sample(states)
+        next_states, rewards, dones = step_func(states, actions)
+        deltas = rewards + gamma * V[next_states] * ~dones - V[states]
+        scatter_update(V, states, deltas, alpha, duplicates)
+        ended = _end_batched_episodes(next_states, dones, steps, reset_func, max_steps_per_episode, stats)
+        episodes += ended
+        states[:] = next_states
+        if checkpointer is not None:
+            checkpointer.step(episodes)
+        if early_stopping is not None and early_stopping.update(n_envs, ended):
+            break
+    if checkpointer is not None:
+        checkpointer.save()
+        V = np.array(V)
+    return V
+
+
+@instrumented
+def batched_tabular_sarsa_control(
+        states_count: int,
+        actions_count: int,
+        reset_func: Callable,
+        step_func: Callable,
+        is_terminal_func: Callable,
+        n_envs: int = 64,
+        max_episodes: int = 10000,
+        max_steps_per_episode: int = 10,
+        gamma: float = 0.99,
+        alpha: float = 0.01,
+        epsilon: float = 0.75,
+        duplicates: str = "serial",
+        checkpointer: Checkpointer = None,
+        early_stopping: EarlyStopping = None,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
+) -> (np.ndarray, np.ndarray):
+    assert n_envs > 0
+    dtypes = as_dtype_policy(dtypes)
+    Q = dtypes.values(np.random.random((states_count, actions_count)))
+    Q[terminal_mask_of(is_terminal_func, states_count)] = 0.0
+
+    states = reset_func(n_envs)
+    actions = np.zeros(n_envs, dtype=np.int64)
+    steps = np.zeros(n_envs, dtype=np.int64)
+    episodes = 0
+    resumed = checkpointer is not None and checkpointer.latest is not None
+    if checkpointer is not None:
+        # The copies are snapshotted mid-episode, so their states, next actions and step counts go with Q.
+        Q = checkpointer.table("Q", Q)
+        states = checkpointer.table("states", states)
+        actions = checkpointer.table("actions", actions)
+        steps = checkpointer.table("steps", steps)
+        episodes = checkpointer.restore()
+
+    policy = EpsilonGreedyPolicy(Q, epsilon, dtypes.greedy_actions(Q))
+    if not resumed:
+        actions[:] = policy.sample(states)
+
+    if early_stopping is not None:
+        early_stopping.start(Q)
+    if stats is not None:
+        step_func = stats.timed_step(step_func)
+
+    while episodes < max_episodes:
+        next_states, rewards, dones = step_func(states, actions)
+        next_actions = policy.sample(next_states)
+        deltas = rewards + gamma * Q[next_states, next_actions] * ~dones - Q[states, actions]
+        scatter_update(Q, states * actions_count + actions, deltas, alpha, duplicates)
+        policy.update(states)
+        truncated = (steps + 1 >= max_steps_per_episode) & ~dones
+        ended = _end_batched_episodes(next_states, dones, steps, reset_func, max_steps_per_episode, stats)
+        episodes += ended
+        if np.any(truncated):
+            next_actions[truncated] = policy.sample(next_states[truncated])
+        states[:], actions[:] = next_states, next_actions
+        if checkpointer is not None:
+            checkpointer.step(episodes)
+        if early_stopping is not None and early_stopping.update(n_envs, ended):
+            break
+    if checkpointer is not None:
+        checkpointer.save()
+        Q = np.array(Q)
+    return Q, dtypes.values(policy.to_matrix())
+
+
+@instrumented
+def batched_tabular_q_learning_control(
+        states_count: int,
+        actions_count: int,
+        reset_func: Callable,
+        step_func: Callable,
+        is_terminal_func: Callable,
+        n_envs: int = 64,
+        max_episodes: int = 10000,
+        max_steps_per_episode: int = 10,
+        gamma: float = 0.99,
+        alpha: float = 0.01,
+        epsilon: float = 0.75,
+        duplicates: str = "serial",
+        checkpointer: Checkpointer = None,
+        early_stopping: EarlyStopping = None,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
+) -> (np.ndarray, np.ndarray):
+    assert n_envs > 0
+    dtypes = as_dtype_policy(dtypes)
+    Q = dtypes.values(np.random.random((states_count, actions_count)))
+    Q[terminal_mask_of(is_terminal_func, states_count)] = 0.0
+
+    states = reset_func(n_envs)
+    steps = np.zeros(n_envs, dtype=np.int64)
+    episodes = 0
+    if checkpointer is not None:
+        # The copies are snapshotted mid-episode, so their states and step counts go with Q.
+        Q = checkpointer.table("Q", Q)
+        states = checkpointer.table("states", states)
+        steps = checkpointer.table("steps", steps)
+        episodes = checkpointer.restore()
+
+    policy = EpsilonGreedyPolicy(Q, epsilon, dtypes.greedy_actions(Q))
+
+    if early_stopping is not None:
+        early_stopping.start(Q)
+    if stats is not None:
+        step_func = stats.timed_step(step_func)
+
+    while episodes < max_episodes:
+        actions = policy.sample(states)
+        next_states, rewards, dones = step_func(states, actions)
+        deltas = rewards + gamma * np.max(Q[next_states], axis=1) * ~dones - Q[states, actions]
+        scatter_update(Q, states * actions_count + actions, deltas, alpha, duplicates)
+        policy.update(states)
+        ended = _end_batched_episodes(next_states, dones, steps, reset_func, max_steps_per_episode, stats)
+        episodes += ended
+        states[:] = next_states
+        if checkpointer is not None:
+            checkpointer.step(episodes)
+        if early_stopping is not None and early_stopping.update(n_envs, ended):
+            break
+    if checkpointer is not None:
+        checkpointer.save()
+        Q = np.array(Q)
+    return Q, dtypes.values(DeterministicPolicy(policy.greedy_actions, actions_count).to_matrix())
+
+
+# The streaming functions replay episodes recorded with trajectory_store.record_episodes instead of
+# generating new ones; only one memory-mapped chunk is read at a time.
+@instrumented
+def streaming_first_visit_monte_carlo_prediction(
+        store: TrajectoryStore,
+        states_count: int,
+        is_terminal_func: Callable,
+        gamma: float = 0.99,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
+) -> np.ndarray:
+    dtypes = as_dtype_policy(dtypes)
+    V = dtypes.values(np.random.random(states_count))
+
+    terminal_mask = terminal_mask_of(is_terminal_func, states_count)
+    V[terminal_mask] = 0.0
+
+    returns = np.zeros(states_count, dtype=dtypes.value)
+    returns_count = dtypes.counts(states_count)
+    first_visit = first_visit_scratch(states_count)
+
+    for chunk in store.chunks():
+        states, rewards = np.asarray(chunk.states), np.asarray(chunk.rewards)
+        for e in range(chunk.episodes_count):
+            lo, hi = chunk.offsets[e], chunk.offsets[e + 1]
+            _first_visit_prediction_update(states[lo:hi], rewards[lo:hi], gamma, returns, returns_count, first_visit)
+            if stats is not None:
+                stats.episode(hi - lo)
+    visited = returns_count > 0
+    V[visited] = returns[visited] / returns_count[visited]
+    return V
+
+
+@instrumented
+def streaming_tabular_td_zero_prediction(
+        store: TrajectoryStore,
+        states_count: int,
+        is_terminal_func: Callable,
+        gamma: float = 0.99,
+        alpha: float = 0.1,
+        epochs: int = 1,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
+) -> np.ndarray:
+    assert epochs > 0
+    dtypes = as_dtype_policy(dtypes)
+    V = dtypes.values(np.random.random(states_count))
+
+    terminal_mask = terminal_mask_of(is_terminal_func, states_count)
+    V[terminal_mask] = 0.0
+
+    for epoch in range(epochs):
+        for chunk in store.chunks():
+            transitions = zip(chunk.states.tolist(), chunk.next_states.tolist(), chunk.rewards.tolist())
+            for s, s_p, r in transitions:
+                V[s] += alpha * (r + gamma * V[s_p] - V[s])
+            if stats is not None:
+                for length in np.diff(chunk.offsets):
+                    stats.episode(length)
+    return V
+
+
+@instrumented
+def streaming_off_policy_monte_carlo_control(
+        store: TrajectoryStore,
+        states_count: int,
+        actions_count: int,
+        is_terminal_func: Callable,
+        gamma: float = 0.99,
+        dtypes: DTypePolicy = None,
+        stats: Stats = None
+) -> (np.ndarray, np.ndarray):
+    dtypes = as_dtype_policy(dtypes)
+    Q = dtypes.values(np.random.random((states_count, actions_count)))
+
+    terminal_mask = terminal_mask_of(is_terminal_func, states_count)
+    Q[terminal_mask] = 0.0
+    C = np.zeros((states_count, actions_count), dtype=dtypes.value)
+    greedy_actions = dtypes.greedy_actions(Q)
+
+    # The importance weights come from the behaviour probabilities stored alongside each action.
+    for chunk in store.chunks():
+        states, actions = np.asarray(chunk.states), np.asarray(chunk.actions)
+        rewards, behaviour_probabilities = np.asarray(chunk.rewards), np.asarray(chunk.behaviour_probabilities)
+        for e in range(chunk.episodes_count):
+            lo, hi = chunk.offsets[e], chunk.offsets[e + 1]
+            _off_policy_episode_update(states[lo:hi], actions[lo:hi], rewards[lo:hi], gamma, Q, C, greedy_actions,
+                                       behaviour_probabilities[lo:hi])
+            if stats is not None:
+                stats.episode(hi - lo)
+
+    return Q, dtypes.values(DeterministicPolicy(greedy_actions, actions_count).to_matrix())
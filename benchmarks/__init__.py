@@ -0,0 +1,310 @@
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+
+import numpy as np
+
+import algorithms
+import kernels
+from envs import VectorEnv
+from instrumentation import Stats
+from grid_world import make_grid_world
+from line_world import make_line_world
+from policies import tabular_random_uniform_policy
+from samplers import reseed
+from trajectory_store import TrajectoryStore, record_episodes
+
+GAMMA = 0.99
+THETA = 0.00001
+
+LINE_WORLD_SIZES = [5, 100, 1000, 10 ** 5]
+GRID_WORLD_SIDES = [4, 32, 128, 512]
+EPISODES = [100, 1000]
+
+QUICK_LINE_WORLD_SIZES = [5, 100]
+QUICK_GRID_WORLD_SIDES = [4, 16]
+QUICK_EPISODES = [100]
+
+MAX_STEPS_PER_EPISODE = 1000
+
+# The pure-Python DP loops are O(S^2 A) per sweep and prioritized sweeping backs up one state at a
+# time, so they only run on the smaller environments.
+PYTHON_BACKEND_MAX_STATES = 64
+PRIORITIZED_MAX_STATES = 4096
+
+
+class Problem:
+    # One environment with its exact DP solutions, shared by every run made on it.
+    def __init__(self, name: str, size: int, env: VectorEnv):
+        self.name = name
+        self.size = size
+        self.env = env
+        self.model = env.model
+        self.S = np.arange(env.n_states)
+        self.A = np.arange(env.n_actions)
+        self.T = np.flatnonzero(env.terminal_mask)
+        self.random_policy = tabular_random_uniform_policy(env.n_states, env.n_actions)
+        self.V_star = algorithms.value_iteration(self.S, self.A, self.model, self.T, GAMMA, 1e-10)[0]
+        self.V_random = algorithms.linear_policy_evaluation(self.S, self.A, self.model, self.T, self.random_policy,
+                                                            GAMMA, 1e-10)
+        self._P = None
+        self._stores = {}
+
+    @property
+    def P(self) -> np.ndarray:
+        if self._P is None:
+            self._P = self.model.to_dense()
+        return self._P
+
+    def trajectory_store(self, episodes: int, seed: int = 0) -> TrajectoryStore:
+        # Random-policy episodes recorded on disk once per episode count, for the streaming runs to replay.
+        if episodes not in self._stores:
+            directory = tempfile.TemporaryDirectory()
+            reseed(seed)
+            store = record_episodes(directory.name, self.random_policy, self.env.reset, self.env.step,
+                                    self.env.is_terminal, max_episodes=episodes,
+                                    max_steps_per_episode=min(10 * self.env.n_states, MAX_STEPS_PER_EPISODE))
+            self._stores[episodes] = (directory, store)
+        return self._stores[episodes][1]
+
+    def value_error(self, V: np.ndarray, V_exact: np.ndarray) -> float:
+        return float(np.max(np.abs(V - V_exact)[~self.env.terminal_mask], initial=0.0))
+
+    def policy_error(self, Pi: np.ndarray) -> float:
+        V = algorithms.linear_policy_evaluation(self.S, self.A, self.model, self.T, Pi, GAMMA, 1e-10)
+        return self.value_error(V, self.V_star)
+
+
+class CountingEnv:
+    # Forwards to a VectorEnv while counting the transitions sampled through step.
+    def __init__(self, env: VectorEnv):
+        self.env = env
+        self.steps = 0
+
+    def step(self, states, actions, auto_reset: bool = True):
+        self.steps += np.size(states)
+        return self.env.step(states, actions, auto_reset)
+
+
+def _dp(func: Callable, kind: str, **kwargs) -> Callable:
+    def run(problem: Problem, episodes: int, counter: CountingEnv) -> dict:
+        P = problem.P if kwargs.get("backend") == "python" else problem.model
+        stats = Stats()
+        if kind == "prediction":
+            result = func(problem.S, problem.A, P, problem.T, problem.random_policy, GAMMA, THETA, stats=stats,
+                          **kwargs)
+        else:
+            result = func(problem.S, problem.A, P, problem.T, gamma=GAMMA, theta=THETA, stats=stats, **kwargs)
+        V = result[0] if isinstance(result, tuple) else result
+        V_exact = problem.V_random if kind == "prediction" else problem.V_star
+        return {"error": problem.value_error(V, V_exact), "sweeps": stats.sweeps or None}
+
+    return run
+
+
+def _sampled(func: Callable, kind: str, batched: bool = False, **kwargs) -> Callable:
+    def run(problem: Problem, episodes: int, counter: CountingEnv) -> dict:
+        env = problem.env
+        max_steps = min(10 * env.n_states, MAX_STEPS_PER_EPISODE)
+        if kind == "prediction":
+            head = (problem.random_policy,)
+        else:
+            head = (env.n_states, env.n_actions)
+        if batched:
+            result = func(*head, env.reset, counter.step, env.is_terminal, max_episodes=episodes,
+                          max_steps_per_episode=max_steps, gamma=GAMMA, **kwargs)
+        elif func is algorithms.monte_carlo_with_exploring_starts_control:
+            result = func(*head, counter.step, env.is_terminal, max_episodes=episodes,
+                          max_steps_per_episode=max_steps, gamma=GAMMA, **kwargs)
+        else:
+            result = func(*head, env.reset, counter.step, env.is_terminal, max_episodes=episodes,
+                          max_steps_per_episode=max_steps, gamma=GAMMA, **kwargs)
+        if kind == "prediction":
+            return {"error": problem.value_error(result, problem.V_random), "sweeps": None}
+        return {"error": problem.policy_error(result[1]), "sweeps": None}
+
+    return run
+
+
+def _streaming(func: Callable, kind: str, **kwargs) -> Callable:
+    def run(problem: Problem, episodes: int, counter: CountingEnv) -> dict:
+        env = problem.env
+        store = problem.trajectory_store(episodes)
+        if kind == "prediction":
+            result = func(store, env.n_states, env.is_terminal, gamma=GAMMA, **kwargs)
+            return {"error": problem.value_error(result, problem.V_random), "sweeps": None}
+        result = func(store, env.n_states, env.n_actions, env.is_terminal, gamma=GAMMA, **kwargs)
+        return {"error": problem.policy_error(result[1]), "sweeps": None}
+
+    # Recording the store is not part of what is being timed.
+    run.prepare = lambda problem, episodes: problem.trajectory_store(episodes)
+    return run
+
+
+def _benchmarks(problem: Problem) -> list:
+    # (algorithm, backend, uses episodes, runner)
+    A = algorithms
+    cases = [
+        ("iterative_policy_evaluation", "numpy/jacobi", False, _dp(A.iterative_policy_evaluation, "prediction")),
+        ("iterative_policy_evaluation", "numpy/gauss_seidel", False,
+         _dp(A.iterative_policy_evaluation, "prediction", sweep="gauss_seidel")),
+        ("linear_policy_evaluation", "auto", False, _dp(A.linear_policy_evaluation, "prediction")),
+        ("linear_policy_evaluation", "bicgstab", False,
+         _dp(A.linear_policy_evaluation, "prediction", solver="bicgstab")),
+        ("policy_iteration", "numpy/iterative", False, _dp(A.policy_iteration, "control")),
+        ("policy_iteration", "numpy/linear", False, _dp(A.policy_iteration, "control", evaluation="linear")),
+        ("value_iteration", "jacobi", False, _dp(A.value_iteration, "control")),
+        ("value_iteration", "gauss_seidel", False,
+         _dp(A.value_iteration, "control", sweep="gauss_seidel")),
+        ("modified_policy_iteration", "jacobi", False, _dp(A.modified_policy_iteration, "control")),
+        ("first_visit_monte_carlo_prediction", "python", True,
+         _sampled(A.first_visit_monte_carlo_prediction, "prediction")),
+        ("first_visit_monte_carlo_prediction", "processes", True,
+         _sampled(A.first_visit_monte_carlo_prediction, "prediction", n_jobs=2)),
+        ("monte_carlo_with_exploring_starts_control", "python", True,
+         _sampled(A.monte_carlo_with_exploring_starts_control, "control")),
+        ("on_policy_first_visit_monte_carlo_epsilon_soft_control", "python", True,
+         _sampled(A.on_policy_first_visit_monte_carlo_epsilon_soft_control, "control")),
+        ("on_policy_first_visit_monte_carlo_epsilon_soft_control", "processes", True,
+         _sampled(A.on_policy_first_visit_monte_carlo_epsilon_soft_control, "control", n_jobs=2)),
+        ("off_policy_monte_carlo_control", "python", True, _sampled(A.off_policy_monte_carlo_control, "control")),
+        ("off_policy_monte_carlo_control", "processes", True,
+         _sampled(A.off_policy_monte_carlo_control, "control", n_jobs=2)),
+        ("tabular_td_zero_prediction", "python", True, _sampled(A.tabular_td_zero_prediction, "prediction")),
+        ("tabular_sarsa_control", "python", True, _sampled(A.tabular_sarsa_control, "control")),
+        ("tabular_sarsa_control", "numba", True,
+         _sampled(A.tabular_sarsa_control, "control", env=problem.env, backend="numba")),
+        ("tabular_q_learning_control", "python", True, _sampled(A.tabular_q_learning_control, "control")),
+        ("tabular_q_learning_control", "numba", True,
+         _sampled(A.tabular_q_learning_control, "control", env=problem.env, backend="numba")),
+        ("tabular_n_step_td_prediction", "n=4", True, _sampled(A.tabular_n_step_td_prediction, "prediction")),
+        ("tabular_td_lambda_prediction", "lambda=0.9", True, _sampled(A.tabular_td_lambda_prediction, "prediction")),
+        ("tabular_n_step_sarsa_control", "n=4", True, _sampled(A.tabular_n_step_sarsa_control, "control")),
+        ("tabular_sarsa_lambda_control", "lambda=0.9", True, _sampled(A.tabular_sarsa_lambda_control, "control")),
+        ("tabular_watkins_q_lambda_control", "lambda=0.9", True,
+         _sampled(A.tabular_watkins_q_lambda_control, "control")),
+        ("dyna_q_control", "planning_steps=10", True, _sampled(A.dyna_q_control, "control")),
+        ("batched_tabular_td_zero_prediction", "n_envs=64", True,
+         _sampled(A.batched_tabular_td_zero_prediction, "prediction", batched=True)),
+        ("batched_tabular_sarsa_control", "n_envs=64", True,
+         _sampled(A.batched_tabular_sarsa_control, "control", batched=True)),
+        ("batched_tabular_q_learning_control", "n_envs=64", True,
+         _sampled(A.batched_tabular_q_learning_control, "control", batched=True)),
+        ("streaming_first_visit_monte_carlo_prediction", "store", True,
+         _streaming(A.streaming_first_visit_monte_carlo_prediction, "prediction")),
+        ("streaming_tabular_td_zero_prediction", "store", True,
+         _streaming(A.streaming_tabular_td_zero_prediction, "prediction")),
+        ("streaming_off_policy_monte_carlo_control", "store", True,
+         _streaming(A.streaming_off_policy_monte_carlo_control, "control")),
+    ]
+    if problem.env.n_states <= PRIORITIZED_MAX_STATES:
+        cases += [
+            ("iterative_policy_evaluation", "numpy/prioritized", False,
+             _dp(A.iterative_policy_evaluation, "prediction", sweep="prioritized")),
+            ("prioritized_sweeping", "numpy", False, _dp(A.prioritized_sweeping, "control")),
+        ]
+    if problem.env.n_states <= PYTHON_BACKEND_MAX_STATES:
+        cases += [
+            ("iterative_policy_evaluation", "python", False,
+             _dp(A.iterative_policy_evaluation, "prediction", backend="python")),
+            ("policy_iteration", "python", False, _dp(A.policy_iteration, "control", backend="python")),
+        ]
+    return cases
+
+
+def _measure(runner: Callable, problem: Problem, episodes: int, seed: int, trace_memory: bool) -> dict:
+    if hasattr(runner, "prepare"):
+        runner.prepare(problem, episodes)
+    counter = CountingEnv(problem.env)
+    reseed(seed)
+    start = time.perf_counter()
+    outcome = runner(problem, episodes, counter)
+    wall_time = time.perf_counter() - start
+    peak_memory = None
+    if trace_memory:
+        # A second, identical run under tracemalloc so the tracing overhead stays out of wall_time.
+        reseed(seed)
+        tracemalloc.start()
+        runner(problem, episodes, CountingEnv(problem.env))
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    sweeps = outcome["sweeps"]
+    return {
+        "wall_time": wall_time,
+        "sweeps": sweeps,
+        "sweeps_per_sec": sweeps / wall_time if sweeps is not None and wall_time > 0 else None,
+        "env_steps": counter.steps if counter.steps else None,
+        "env_steps_per_sec": counter.steps / wall_time if counter.steps and wall_time > 0 else None,
+        "peak_memory_bytes": peak_memory,
+        "error": outcome["error"]
+    }
+
+
+def make_problems(line_world_sizes: list, grid_world_sides: list) -> list:
+    problems = [Problem("line_world", size, make_line_world(size)) for size in line_world_sizes]
+    problems += [Problem("grid_world", side, make_grid_world(side, side).env) for side in grid_world_sides]
+    return problems
+
+
+def run_benchmarks(
+        problems: list,
+        episodes_grid: list,
+        algorithm_names: list = None,
+        seed: int = 0,
+        trace_memory: bool = True,
+        log: Callable = None
+) -> list:
+    results = []
+    for problem in problems:
+        for name, backend, uses_episodes, runner in _benchmarks(problem):
+            if algorithm_names is not None and name not in algorithm_names:
+                continue
+            for episodes in (episodes_grid if uses_episodes else [None]):
+                record = {"algorithm": name, "backend": backend, "env": problem.name, "size": problem.size,
+                          "states": int(problem.env.n_states), "episodes": episodes}
+                record.update(_measure(runner, problem, episodes, seed, trace_memory))
+                if backend == "numba" and not kernels.NUMBA_AVAILABLE:
+                    record["backend"] = "numba (python fallback)"
+                results.append(record)
+                if log is not None:
+                    log(record)
+    return results
+
+
+def environment_info() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "numba": kernels.NUMBA_AVAILABLE,
+        "platform": platform.platform()
+    }
+
+
+def _key(record: dict) -> tuple:
+    return record["algorithm"], record["backend"], record["env"], record["size"], record["episodes"]
+
+
+def compare_results(old: list, new: list, time_tolerance: float = 0.25, error_tolerance: float = 1e-6) -> list:
+    # Runs that got slower than time_tolerance (relative) or less accurate than error_tolerance (absolute).
+    previous = {_key(record): record for record in old}
+    regressions = []
+    for record in new:
+        before = previous.get(_key(record))
+        if before is None:
+            continue
+        if record["wall_time"] > before["wall_time"] * (1 + time_tolerance):
+            regressions.append((_key(record), "wall_time", before["wall_time"], record["wall_time"]))
+        if record["error"] > before["error"] + error_tolerance:
+            regressions.append((_key(record), "error", before["error"], record["error"]))
+    return regressions
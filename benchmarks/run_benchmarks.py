@@ -0,0 +1,43 @@
+import argparse
+import json
+
+from benchmarks import EPISODES, GRID_WORLD_SIDES, LINE_WORLD_SIZES, QUICK_EPISODES, QUICK_GRID_WORLD_SIDES, \
+    QUICK_LINE_WORLD_SIZES, compare_results, environment_info, make_problems, run_benchmarks
+
+
+def _print_record(record: dict) -> None:
+    print("{algorithm:<56} {backend:<26} {env:<10} {size:>7} {episodes!s:>6} {wall_time:>10.4f}s "
+          "error={error:.3g}".format(**record), flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--quick", action="store_true", help="small environments and episode counts only")
+    parser.add_argument("--algorithms", nargs="*", default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    parser.add_argument("--compare", default=None, help="previous results file to check for regressions")
+    args = parser.parse_args()
+
+    if args.quick:
+        problems = make_problems(QUICK_LINE_WORLD_SIZES, QUICK_GRID_WORLD_SIDES)
+        episodes_grid = QUICK_EPISODES
+    else:
+        problems = make_problems(LINE_WORLD_SIZES, GRID_WORLD_SIDES)
+        episodes_grid = EPISODES
+
+    results = run_benchmarks(problems, episodes_grid, args.algorithms, args.seed, not args.no_memory,
+                             log=_print_record)
+    with open(args.output, "w") as f:
+        json.dump({"environment": environment_info(), "results": results}, f, indent=1)
+    print("Results written to", args.output)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            previous = json.load(f)["results"]
+        regressions = compare_results(previous, results)
+        for key, metric, before, after in regressions:
+            print("REGRESSION", key, metric, before, "->", after)
+        if regressions:
+            raise SystemExit(1)
@@ -0,0 +1,101 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from samplers import clear_streams
+
+LATEST = "LATEST"
+
+
+class Checkpointer:
+    # Tables registered with table() live in memory-mapped .npy files under directory/work. Every
+    # interval episodes they are copied, with the np.random state and the episode counter, into a new
+    # directory/snapshot-<episode> directory, and LATEST is switched to it. A checkpointer created on a
+    # directory that already has a snapshot resumes from it. The next checkpointer on the same directory
+    # reuses the work files, so the algorithms return copies of the tables rather than the tables themselves.
+    # Anything else an algorithm carries from one episode to the next (Dyna-Q's replay buffer, the states of
+    # the batched algorithms' copies) is registered as a table too, so a resumed run matches an uninterrupted one.
+    def __init__(self, directory: str, interval: int = 1000, keep: int = 2):
+        assert interval > 0
+        assert keep > 0
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+        self.episode = 0
+        self._work = os.path.join(directory, "work")
+        os.makedirs(self._work, exist_ok=True)
+        self._tables = {}
+        self.latest = self._read_latest()
+
+    def _read_latest(self) -> str:
+        path = os.path.join(self.directory, LATEST)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return os.path.join(self.directory, f.read().strip())
+
+    def table(self, name: str, initial: np.ndarray) -> np.ndarray:
+        table = np.lib.format.open_memmap(os.path.join(self._work, name + ".npy"), mode='w+', dtype=initial.dtype,
+                                          shape=initial.shape)
+        if self.latest is None:
+            table[...] = initial
+        else:
+            table[...] = np.load(os.path.join(self.latest, name + ".npy"), mmap_mode='r')
+        self._tables[name] = table
+        return table
+
+    def restore(self) -> int:
+        # Call once every table is registered: returns the episode to continue from and, when
+        # resuming, puts np.random back in the state it had when the snapshot was taken.
+        clear_streams()
+        if self.latest is None:
+            self.episode = 0
+            return 0
+        with open(os.path.join(self.latest, "state.json")) as f:
+            state = json.load(f)
+        keys = np.load(os.path.join(self.latest, "rng_keys.npy"))
+        np.random.set_state((state["rng"][0], keys, *state["rng"][1:]))
+        self.episode = state["episode"]
+        return self.episode
+
+    def step(self, episode: int) -> None:
+        # The batched algorithms can finish several episodes at once, so a snapshot is taken whenever
+        # the counter crosses a multiple of interval rather than only when it lands on one.
+        crossed = episode // self.interval > self.episode // self.interval
+        self.episode = int(episode)
+        if crossed:
+            self.save()
+
+    def save(self) -> str:
+        name = "snapshot-{:012d}".format(self.episode)
+        final = os.path.join(self.directory, name)
+        if os.path.isdir(final):
+            return final
+        # Streams are cleared so that the run carries on from the recorded np.random state, exactly
+        # as a run resumed from this snapshot does.
+        clear_streams()
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.directory)
+        for table_name, table in self._tables.items():
+            table.flush()
+            shutil.copyfile(table.filename, os.path.join(tmp, table_name + ".npy"))
+        algorithm, keys, position, has_gauss, cached_gaussian = np.random.get_state()
+        np.save(os.path.join(tmp, "rng_keys.npy"), keys)
+        with open(os.path.join(tmp, "state.json"), "w") as f:
+            json.dump({"episode": self.episode, "rng": [algorithm, int(position), int(has_gauss),
+                                                        float(cached_gaussian)],
+                       "tables": sorted(self._tables)}, f)
+        os.rename(tmp, final)
+
+        pointer = os.path.join(self.directory, LATEST + ".tmp")
+        with open(pointer, "w") as f:
+            f.write(name)
+        os.replace(pointer, os.path.join(self.directory, LATEST))
+        self.latest = final
+
+        snapshots = sorted(d for d in os.listdir(self.directory) if d.startswith("snapshot-"))
+        for old in snapshots[:-self.keep]:
+            shutil.rmtree(os.path.join(self.directory, old))
+        return final
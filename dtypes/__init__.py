@@ -0,0 +1,41 @@
+import numpy as np
+
+
+class DTypePolicy:
+    # value is used for V, Q, returns, C and policy matrices, count for visit counters, state and
+    # action for arrays of state and action indices (and for the transition models' next states).
+    def __init__(
+            self,
+            value=np.float64,
+            count=np.float64,
+            state=np.int64,
+            action=np.int64
+    ):
+        self.value = np.dtype(value)
+        self.count = np.dtype(count)
+        self.state = np.dtype(state)
+        self.action = np.dtype(action)
+
+    def __repr__(self) -> str:
+        return "DTypePolicy(value={}, count={}, state={}, action={})".format(self.value, self.count, self.state,
+                                                                             self.action)
+
+    def values(self, table: np.ndarray) -> np.ndarray:
+        return table.astype(self.value, copy=False)
+
+    def counts(self, shape) -> np.ndarray:
+        return np.zeros(shape, dtype=self.count)
+
+    def greedy_actions(self, Q: np.ndarray) -> np.ndarray:
+        assert Q.shape[1] <= np.iinfo(self.action).max + 1
+        return np.argmax(Q, axis=1).astype(self.action, copy=False)
+
+
+# FLOAT64 is what every table defaulted to so far; COMPACT halves values and counters and stores
+# actions in one byte, which limits it to 256 actions and 2^31 states.
+FLOAT64 = DTypePolicy()
+COMPACT = DTypePolicy(np.float32, np.int32, np.int32, np.uint8)
+
+
+def as_dtype_policy(dtypes: DTypePolicy = None) -> DTypePolicy:
+    return FLOAT64 if dtypes is None else dtypes
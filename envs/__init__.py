@@ -0,0 +1,66 @@
+from typing import Union
+
+import numpy as np
+
+from dtypes import DTypePolicy
+from models import SparseTransitionModel, dense_to_sparse
+from samplers import TransitionSampler, UniformStream
+
+
+class TabularEnv:
+    # reset, is_terminal and step take either one state (and action) or arrays of them;
+    # reset() returns one start state and reset(n) an array of n.
+    n_states: int
+    n_actions: int
+    terminal_mask: np.ndarray
+    start_state: int
+    state_dtype = np.dtype(np.int64)
+
+    def reset(self, n: int = None):
+        if n is None:
+            return self.start_state
+        return np.full(n, self.start_state, dtype=self.state_dtype)
+
+    def is_terminal(self, states):
+        return self.terminal_mask[states]
+
+    def step(self, states, actions, auto_reset: bool = True):
+        raise NotImplementedError
+
+
+class VectorEnv(TabularEnv):
+    def __init__(
+            self,
+            P: Union[np.ndarray, SparseTransitionModel],
+            T: np.ndarray,
+            start_state: int,
+            dtypes: DTypePolicy = None,
+            rng: np.random.Generator = None,
+            sampler_tables: dict = None
+    ):
+        self.model = P if isinstance(P, SparseTransitionModel) else dense_to_sparse(P)
+        if dtypes is not None:
+            self.model = self.model.astype(dtypes)
+        self.n_states = self.model.states_count
+        self.n_actions = self.model.actions_count
+        self.start_state = start_state
+        # Batched steps return the model's next_states dtype, so reset(n) uses it too.
+        self.state_dtype = self.model.next_states.dtype
+        self.terminal_mask = np.zeros(self.n_states, dtype=bool)
+        self.terminal_mask[T] = True
+        self.transitions = TransitionSampler(self.model, None if rng is None else UniformStream(rng=rng), dtypes,
+                                             sampler_tables)
+
+    def step(self, states, actions, auto_reset: bool = True):
+        # One transition returns (next_state, reward, done) as is; arrays of them have their
+        # finished copies sent back to start_state when auto_reset is set.
+        if not isinstance(states, np.ndarray):
+            assert not self.terminal_mask[states]
+            next_state, reward = self.transitions.sample(states, actions)
+            return next_state, reward, self.terminal_mask[next_state]
+        assert not np.any(self.terminal_mask[states])
+        next_states, rewards = self.transitions.sample_batch(states, actions)
+        dones = self.terminal_mask[next_states]
+        if auto_reset:
+            next_states[dones] = self.start_state
+        return next_states, rewards, dones
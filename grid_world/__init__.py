@@ -1,48 +1,212 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from functools import cached_property
+
 import numpy as np
 
+from dtypes import DTypePolicy, as_dtype_policy
+from envs import TabularEnv, VectorEnv
+from models import SparseTransitionModel
+from samplers import TRANSITION_SAMPLER_TABLES, TransitionSampler
+
+_MODEL_ARRAYS = ("indptr", "next_states", "probabilities", "rewards")
+# Along with the model arrays, the cache keeps what the model and its sampler derive from them, so a
+# load only maps files. Bump _CACHE_VERSION whenever the set of cached arrays changes.
+_CACHED_ARRAYS = _MODEL_ARRAYS + ("row_ids", "expected_rewards") + TRANSITION_SAMPLER_TABLES
+_CACHE_VERSION = 2
+
+
+def _grid_world_model(
+        width: int,
+        height: int,
+        obstacle_mask: np.ndarray,
+        state_rewards: np.ndarray,
+        terminal_mask: np.ndarray,
+        slip_prob: float
+) -> dict:
+    states = np.arange(width * height)
+    x, y = states % width, states // width
+    # targets[s, a] is where action a leads from s: 0: left, 1: Right, 2: Up, 3: Down
+    targets = np.stack([np.where(x > 0, states - 1, states),
+                        np.where(x < width - 1, states + 1, states),
+                        np.where(y > 0, states - width, states),
+                        np.where(y < height - 1, states + width, states)], axis=1)
+    targets = np.where(obstacle_mask[targets], states[:, None], targets)
+
+    # With slip_prob > 0 each row gets one entry per direction: the chosen one keeps 1 - slip_prob
+    # and the three others share slip_prob.
+    if slip_prob > 0:
+        next_states = np.broadcast_to(targets[:, None, :], (states.shape[0], 4, 4))
+        probabilities = np.where(np.eye(4, dtype=bool), 1.0 - slip_prob, slip_prob / 3)
+        probabilities = np.broadcast_to(probabilities, next_states.shape)
+    else:
+        next_states = targets[:, :, None]
+        probabilities = np.ones(next_states.shape)
+
+    active = ~(terminal_mask | obstacle_mask)
+    next_states = next_states[active].ravel()
+    counts = np.where(np.repeat(active, 4), probabilities.shape[2], 0)
+    indptr = np.zeros(states.shape[0] * 4 + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return {
+        "indptr": indptr,
+        "next_states": next_states.astype(np.int64),
+        "probabilities": probabilities[active].ravel().astype(np.float64),
+        "rewards": state_rewards[next_states]
+    }
+
+
+def _load_or_build(cache_dir: str, key: str, build) -> dict:
+    # Every parameter set gets its own directory of .npy files, written to a temporary directory
+    # first and renamed into place so a concurrent reader never sees a half-written model.
+    path = os.path.join(cache_dir, key)
+    if not os.path.isdir(path):
+        arrays = build()
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=cache_dir)
+        for name in _CACHED_ARRAYS:
+            np.save(os.path.join(tmp, name + ".npy"), arrays[name])
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            shutil.rmtree(tmp)
+    return {name: np.load(os.path.join(path, name + ".npy"), mmap_mode='r') for name in _CACHED_ARRAYS}
+
+
+class GridWorld(TabularEnv):
+    # Only the cheap parameters are computed up front; the transition model and the
+    # environment are built (or loaded from cache_dir) the first time they are used.
+    def __init__(
+            self,
+            width: int,
+            height: int,
+            obstacles: np.ndarray,
+            rewards: dict,
+            terminals: np.ndarray,
+            slip_prob: float,
+            start_state: int,
+            cache_dir: str = None,
+            dtypes: DTypePolicy = None
+    ):
+        self.width = width
+        self.height = height
+        self.n_states = width * height
+        self.n_actions = 4
+        self.S = np.arange(self.n_states)
+        self.A = np.arange(4)
+        self.T = terminals
+        self.start_state = start_state
+        self.obstacles = obstacles
+        self.rewards = rewards
+        self.slip_prob = slip_prob
+        self.cache_dir = cache_dir
+        self.dtypes = as_dtype_policy(dtypes)
+        self.state_dtype = self.dtypes.state
+
+    @cached_property
+    def key(self) -> str:
+        description = repr((self.width, self.height, self.obstacles.tolist(), sorted(self.rewards.items()),
+                            self.T.tolist(), float(self.slip_prob), str(self.dtypes.value), str(self.dtypes.state),
+                            _CACHE_VERSION))
+        return hashlib.sha1(description.encode()).hexdigest()[:16]
+
+    @cached_property
+    def terminal_mask(self) -> np.ndarray:
+        mask = np.zeros(self.n_states, dtype=bool)
+        mask[self.T] = True
+        return mask
+
+    def _build_arrays(self) -> dict:
+        obstacle_mask = np.zeros(self.n_states, dtype=bool)
+        obstacle_mask[self.obstacles] = True
+        state_rewards = np.zeros(self.n_states)
+        for state, reward in self.rewards.items():
+            state_rewards[state] = reward
+        arrays = _grid_world_model(self.width, self.height, obstacle_mask, state_rewards, self.terminal_mask,
+                                   self.slip_prob)
+        arrays["next_states"] = arrays["next_states"].astype(self.dtypes.state, copy=False)
+        arrays["probabilities"] = arrays["probabilities"].astype(self.dtypes.value, copy=False)
+        arrays["rewards"] = arrays["rewards"].astype(self.dtypes.value, copy=False)
+        return arrays
+
+    def _build_cached_arrays(self) -> dict:
+        arrays = self._build_arrays()
+        model = SparseTransitionModel(self.n_states, 4, *(arrays[name] for name in _MODEL_ARRAYS))
+        arrays["row_ids"] = model.row_ids
+        arrays["expected_rewards"] = model.expected_rewards.ravel()
+        arrays.update(TransitionSampler(model).tables)
+        return arrays
+
+    @cached_property
+    def _arrays(self) -> dict:
+        if self.cache_dir is None:
+            return self._build_arrays()
+        return _load_or_build(self.cache_dir, self.key, self._build_cached_arrays)
+
+    @cached_property
+    def model(self) -> SparseTransitionModel:
+        arrays = self._arrays
+        return SparseTransitionModel(self.n_states, 4, *(arrays[name] for name in _MODEL_ARRAYS),
+                                     arrays.get("row_ids"), arrays.get("expected_rewards"))
+
+    @cached_property
+    def env(self) -> VectorEnv:
+        sampler_tables = None
+        if all(name in self._arrays for name in TRANSITION_SAMPLER_TABLES):
+            sampler_tables = {name: self._arrays[name] for name in TRANSITION_SAMPLER_TABLES}
+        return VectorEnv(self.model, self.T, self.start_state, sampler_tables=sampler_tables)
+
+    @cached_property
+    def P(self) -> np.ndarray:
+        return self.model.to_dense()
+
+    def step(self, states, actions, auto_reset: bool = True):
+        return self.env.step(states, actions, auto_reset)
+
+
+def make_grid_world(
+        width: int,
+        height: int,
+        obstacles=(),
+        rewards: dict = None,
+        slip_prob: float = 0.0,
+        terminals=None,
+        start_state: int = 0,
+        cache_dir: str = None,
+        dtypes: DTypePolicy = None
+) -> GridWorld:
+    assert width > 0 and height > 0
+    assert 0 <= slip_prob <= 1
+    if rewards is None:
+        rewards = {width - 1: -5.0, width * height - 1: 1.0}
+    obstacles = np.unique(np.asarray(obstacles, dtype=np.int64))
+    terminals = np.unique(np.asarray(list(rewards) if terminals is None else terminals, dtype=np.int64))
+    assert start_state not in obstacles
+    return GridWorld(width, height, obstacles, dict(rewards), terminals, slip_prob, start_state, cache_dir,
+                     dtypes)
+
+
 width = 4
 height = 4
 num_states = width * height
 S = np.arange(num_states)
 A = np.arange(4)  # 0: left, 1: Right, 2: Up, 3: Down
 T = np.array([width - 1, num_states - 1])
-P = np.zeros((len(S), len(A), len(S), 2))
-
-for s in S:
-    if (s % width) == 0:
-        P[s, 0, s, 0] = 1.0
-    else:
-        P[s, 0, s - 1, 0] = 1.0
-    if (s + 1) % width == 0:
-        P[s, 1, s, 0] = 1.0
-    else:
-        P[s, 1, s + 1, 0] = 1.0
-    if s < width:
-        P[s, 2, s, 0] = 1.0
-    else:
-        P[s, 2, s - width, 0] = 1.0
-    if s >= (num_states - width):
-        P[s, 3, s, 0] = 1.0
-    else:
-        P[s, 3, s + width, 0] = 1.0
-
-P[width - 1, :, :, 0] = 0.0
-P[num_states - 1, :, :, 0] = 0.0
-
-P[:, :, width - 1, 1] = -5.0
-P[:, :, num_states - 1, 1] = 1.0
-
 
-def reset() -> int:
-    return 0
+_world = make_grid_world(width, height, rewards={width - 1: -5.0, num_states - 1: 1.0})
 
 
-def is_terminal(state: int) -> bool:
-    return state in T
+def __getattr__(name: str):
+    # P and vector_env are only built when first imported.
+    if name == "P":
+        return _world.P
+    if name == "vector_env":
+        return _world.env
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
-def step(state: int, action: int) -> (int, float, bool):
-    assert not is_terminal(state)
-    next_state = np.random.choice(S, p=P[state, action, :, 0])
-    reward = P[state, action, next_state, 1]
-    return next_state, reward, is_terminal(state)
+reset = _world.reset
+is_terminal = _world.is_terminal
+step = _world.step
@@ -0,0 +1,88 @@
+import tempfile
+
+import numpy as np
+
+from algorithms import off_policy_monte_carlo_control, tabular_q_learning_control, tabular_n_step_td_prediction, \
+    tabular_n_step_sarsa_control, tabular_td_lambda_prediction, tabular_sarsa_lambda_control, \
+    tabular_watkins_q_lambda_control, dyna_q_control, batched_tabular_td_zero_prediction, \
+    batched_tabular_sarsa_control, batched_tabular_q_learning_control
+from checkpoints import Checkpointer
+from grid_world import S, A, reset, step, is_terminal, vector_env
+from policies import tabular_random_uniform_policy
+
+if __name__ == "__main__":
+    print("Q-learning run in one go :")
+    np.random.seed(0)
+    Q_full, Pi_full = tabular_q_learning_control(len(S), len(A), reset, step, is_terminal, max_episodes=1000,
+                                                 max_steps_per_episode=100,
+                                                 checkpointer=Checkpointer(tempfile.mkdtemp(), interval=250))
+    print(Q_full)
+
+    print("Q-learning stopped at episode 500 then resumed :")
+    directory = tempfile.mkdtemp()
+    np.random.seed(0)
+    tabular_q_learning_control(len(S), len(A), reset, step, is_terminal, max_episodes=500,
+                               max_steps_per_episode=100, checkpointer=Checkpointer(directory, interval=250))
+    np.random.seed(123)
+    Q, Pi = tabular_q_learning_control(len(S), len(A), reset, step, is_terminal, max_episodes=1000,
+                                       max_steps_per_episode=100, checkpointer=Checkpointer(directory, interval=250))
+    print(Q)
+    assert np.array_equal(Q, Q_full) and np.array_equal(Pi, Pi_full)
+
+    print("Off-policy Monte Carlo resumed from its checkpoint :")
+    directory = tempfile.mkdtemp()
+    np.random.seed(0)
+    Q_full, _ = off_policy_monte_carlo_control(len(S), len(A), reset, step, is_terminal, max_episodes=400,
+                                               max_steps_per_episode=100,
+                                               checkpointer=Checkpointer(tempfile.mkdtemp(), interval=100))
+    np.random.seed(0)
+    off_policy_monte_carlo_control(len(S), len(A), reset, step, is_terminal, max_episodes=300,
+                                   max_steps_per_episode=100, checkpointer=Checkpointer(directory, interval=100))
+    Q, _ = off_policy_monte_carlo_control(len(S), len(A), reset, step, is_terminal, max_episodes=400,
+                                          max_steps_per_episode=100,
+                                          checkpointer=Checkpointer(directory, interval=100))
+    assert np.array_equal(Q, Q_full)
+    print(Q)
+
+    print("A second run on the same directory leaves the tables of the first one alone :")
+    directory = tempfile.mkdtemp()
+    Q_first, _ = tabular_q_learning_control(len(S), len(A), reset, step, is_terminal, max_episodes=500,
+                                            max_steps_per_episode=100,
+                                            checkpointer=Checkpointer(directory, interval=250))
+    Q_kept = Q_first.copy()
+    Q_second, _ = tabular_q_learning_control(len(S), len(A), reset, step, is_terminal, max_episodes=1000,
+                                             max_steps_per_episode=100,
+                                             checkpointer=Checkpointer(directory, interval=250))
+    assert np.array_equal(Q_first, Q_kept) and not np.array_equal(Q_first, Q_second)
+
+    print("Every other sampling algorithm resumed from its checkpoint :")
+    pi = tabular_random_uniform_policy(len(S), len(A))
+    runs = [
+        (tabular_n_step_td_prediction, (pi, reset, step, is_terminal), {}),
+        (tabular_td_lambda_prediction, (pi, reset, step, is_terminal), {}),
+        (tabular_n_step_sarsa_control, (len(S), len(A), reset, step, is_terminal), {}),
+        (tabular_sarsa_lambda_control, (len(S), len(A), reset, step, is_terminal), {}),
+        (tabular_watkins_q_lambda_control, (len(S), len(A), reset, step, is_terminal), {}),
+        (dyna_q_control, (len(S), len(A), reset, step, is_terminal), {"buffer_capacity": 50}),
+        (dyna_q_control, (len(S), len(A), reset, step, is_terminal), {"model": "last", "sampling": "prioritized"}),
+        (batched_tabular_td_zero_prediction, (pi, vector_env.reset, vector_env.step, is_terminal), {"n_envs": 8}),
+        (batched_tabular_sarsa_control, (len(S), len(A), vector_env.reset, vector_env.step, is_terminal),
+         {"n_envs": 8}),
+        (batched_tabular_q_learning_control, (len(S), len(A), vector_env.reset, vector_env.step, is_terminal),
+         {"n_envs": 8}),
+    ]
+    for func, args, kwargs in runs:
+        np.random.seed(0)
+        full = func(*args, max_episodes=200, max_steps_per_episode=100,
+                    checkpointer=Checkpointer(tempfile.mkdtemp(), interval=50), **kwargs)
+        directory = tempfile.mkdtemp()
+        np.random.seed(0)
+        func(*args, max_episodes=100, max_steps_per_episode=100, checkpointer=Checkpointer(directory, interval=50),
+             **kwargs)
+        np.random.seed(123)
+        resumed = func(*args, max_episodes=200, max_steps_per_episode=100,
+                       checkpointer=Checkpointer(directory, interval=50), **kwargs)
+        if not isinstance(full, tuple):
+            full, resumed = (full,), (resumed,)
+        assert all(np.array_equal(x, y) for x, y in zip(full, resumed)), func.__name__
+        print(func.__name__, "ok")
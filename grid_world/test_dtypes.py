@@ -0,0 +1,50 @@
+import numpy as np
+
+from algorithms import first_visit_monte_carlo_prediction, tabular_q_learning_control, \
+    tabular_td_zero_prediction, value_iteration
+from dtypes import COMPACT
+from grid_world import make_grid_world
+from policies import tabular_random_uniform_policy
+
+if __name__ == "__main__":
+    world = make_grid_world(16, 16)
+    compact_world = make_grid_world(16, 16, dtypes=COMPACT)
+    model, compact_model = world.model, compact_world.model
+    print("Model bytes float64 :", model.next_states.nbytes + model.probabilities.nbytes + model.rewards.nbytes)
+    print("Model bytes compact :", compact_model.next_states.nbytes + compact_model.probabilities.nbytes +
+          compact_model.rewards.nbytes)
+
+    print("Row ids and sampler tables, float64 and compact :")
+    for m, sampler, index_dtype, value_dtype in ((model, world.env.transitions, np.int64, np.float64),
+                                                 (compact_model, compact_world.env.transitions, np.int32, np.float32)):
+        print(m.row_ids.dtype, sampler.entries.dtype, sampler.alias_entries.dtype,
+              sampler.deterministic_entries.dtype, sampler.prob.dtype)
+        assert m.row_ids.dtype == sampler.entries.dtype == sampler.alias_entries.dtype == index_dtype
+        assert sampler.deterministic_entries.dtype == index_dtype and sampler.prob.dtype == value_dtype
+
+    print("Value iteration, compact against float64 :")
+    V, Pi, _, _ = value_iteration(world.S, world.A, model, world.T, theta=1e-6)
+    V_c, Pi_c, _, _ = value_iteration(compact_world.S, compact_world.A, compact_model, compact_world.T, theta=1e-6,
+                                      dtypes=COMPACT)
+    print(V_c.dtype, Pi_c.dtype, np.max(np.abs(V - V_c)))
+    assert V_c.dtype == np.float32 and Pi_c.dtype == np.float32
+    assert np.max(np.abs(V - V_c)) < 1e-3
+
+    print("Monte Carlo and TD(0) prediction, compact against float64 :")
+    Pi = tabular_random_uniform_policy(world.n_states, world.n_actions)
+    for func in (first_visit_monte_carlo_prediction, tabular_td_zero_prediction):
+        np.random.seed(0)
+        V = func(Pi, world.reset, world.step, world.is_terminal, max_episodes=200, max_steps_per_episode=200)
+        np.random.seed(0)
+        V_c = func(Pi, compact_world.reset, compact_world.step, compact_world.is_terminal, max_episodes=200,
+                   max_steps_per_episode=200, dtypes=COMPACT)
+        print(func.__name__, V_c.dtype, np.max(np.abs(V - V_c)))
+        assert V_c.dtype == np.float32
+        assert np.max(np.abs(V - V_c)) < 1e-3
+
+    print("Q-learning with compact tables :")
+    Q, Pi = tabular_q_learning_control(compact_world.n_states, compact_world.n_actions, compact_world.reset,
+                                       compact_world.step, compact_world.is_terminal, max_episodes=2000,
+                                       max_steps_per_episode=200, alpha=0.1, epsilon=0.2, dtypes=COMPACT)
+    print(Q.dtype, Pi.dtype, Q.nbytes, "bytes")
+    assert Q.dtype == np.float32
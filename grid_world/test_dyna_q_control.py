@@ -0,0 +1,30 @@
+import numpy as np
+
+from algorithms import dyna_q_control, linear_policy_evaluation, tabular_q_learning_control, value_iteration
+from grid_world import make_grid_world
+from instrumentation import Stats
+
+if __name__ == "__main__":
+    world = make_grid_world(8, 8, slip_prob=0.1)
+    V_star = value_iteration(world.S, world.A, world.model, world.T, theta=1e-8)[0]
+
+    def value_error(Pi: np.ndarray) -> float:
+        V = linear_policy_evaluation(world.S, world.A, world.model, world.T, Pi)
+        return float(np.max(np.abs(V - V_star)[~world.terminal_mask]))
+
+    q_learning_error = None
+    for name, func, kwargs in (("Q-learning", tabular_q_learning_control, {}),
+                               ("Dyna-Q, replayed transitions", dyna_q_control, {}),
+                               ("Dyna-Q, last observed model", dyna_q_control, {"model": "last"}),
+                               ("Dyna-Q, prioritized replay", dyna_q_control, {"sampling": "prioritized"})):
+        np.random.seed(0)
+        stats = Stats()
+        Q, Pi = func(world.n_states, world.n_actions, world.reset, world.step, world.is_terminal, max_episodes=200,
+                     max_steps_per_episode=200, alpha=0.1, epsilon=0.2, stats=stats, **kwargs)
+        error = value_error(Pi)
+        print("{:<32} env steps={:<7} planning backups={:<7} error={:.4f}".format(name, stats.env_steps,
+                                                                                   stats.backups, error))
+        if func is tabular_q_learning_control:
+            q_learning_error = error
+        else:
+            assert error < min(q_learning_error, 0.25)
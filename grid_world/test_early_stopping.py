@@ -0,0 +1,33 @@
+from algorithms import batched_tabular_q_learning_control, off_policy_monte_carlo_control, \
+    tabular_q_learning_control, tabular_sarsa_control
+from instrumentation import EarlyStopping
+from grid_world import S, A, reset, step, is_terminal, vector_env
+
+if __name__ == "__main__":
+    print("Q-learning until the greedy policy is stable :")
+    early_stopping = EarlyStopping(window=100, patience=5)
+    Q, Pi = tabular_q_learning_control(len(S), len(A), reset, step, is_terminal, max_steps_per_episode=100,
+                                       early_stopping=early_stopping)
+    print(early_stopping.reason, early_stopping.episodes, "episodes")
+    print(Pi)
+
+    print("SARSA until Q stops moving :")
+    early_stopping = EarlyStopping(tolerance=0.01, window=200)
+    Q, Pi = tabular_sarsa_control(len(S), len(A), reset, step, is_terminal, max_steps_per_episode=100,
+                                  epsilon=0.1, early_stopping=early_stopping)
+    print(early_stopping.reason, early_stopping.episodes, "episodes")
+
+    print("Off-policy Monte Carlo with a step budget :")
+    early_stopping = EarlyStopping(max_steps=5000)
+    Q, Pi = off_policy_monte_carlo_control(len(S), len(A), reset, step, is_terminal, max_episodes=100000,
+                                           max_steps_per_episode=100, early_stopping=early_stopping)
+    assert early_stopping.reason == "step_budget"
+    print(early_stopping.reason, early_stopping.episodes, "episodes", early_stopping.steps, "steps")
+
+    print("Batched Q-learning with a time budget :")
+    early_stopping = EarlyStopping(max_time=0.5)
+    Q, Pi = batched_tabular_q_learning_control(len(S), len(A), vector_env.reset, vector_env.step,
+                                               vector_env.is_terminal, n_envs=64, max_episodes=10 ** 9,
+                                               max_steps_per_episode=100, early_stopping=early_stopping)
+    assert early_stopping.reason == "time_budget"
+    print(early_stopping.reason, early_stopping.episodes, "episodes")
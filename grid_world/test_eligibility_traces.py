@@ -0,0 +1,30 @@
+import numpy as np
+
+from algorithms import linear_policy_evaluation, tabular_n_step_sarsa_control, tabular_q_learning_control, \
+    tabular_sarsa_control, tabular_sarsa_lambda_control, tabular_watkins_q_lambda_control, value_iteration
+from grid_world import make_grid_world
+
+if __name__ == "__main__":
+    world = make_grid_world(10, 10)
+    V_star = value_iteration(world.S, world.A, world.model, world.T, theta=1e-8)[0]
+
+    def value_error(Pi: np.ndarray) -> float:
+        V = linear_policy_evaluation(world.S, world.A, world.model, world.T, Pi)
+        return float(V_star[world.start_state] - V[world.start_state])
+
+    print("Start state regret of the greedy policy after 300 episodes, alpha = 0.1 :")
+    errors = {}
+    for name, func, kwargs in (("SARSA", tabular_sarsa_control, {}),
+                               ("4-step SARSA", tabular_n_step_sarsa_control, {"n": 4}),
+                               ("SARSA(0.9)", tabular_sarsa_lambda_control, {"lambda_": 0.9}),
+                               ("Q-learning", tabular_q_learning_control, {}),
+                               ("Watkins Q(0.9)", tabular_watkins_q_lambda_control, {"lambda_": 0.9})):
+        np.random.seed(0)
+        Q, _ = func(world.n_states, world.n_actions, world.reset, world.step, world.is_terminal, max_episodes=300,
+                    max_steps_per_episode=400, alpha=0.1, epsilon=0.3, **kwargs)
+        greedy = np.zeros(Q.shape)
+        greedy[world.S, np.argmax(Q, axis=1)] = 1.0
+        errors[name] = value_error(greedy)
+        print("{:<16} {:.4f}".format(name, errors[name]))
+    assert errors["SARSA(0.9)"] < errors["SARSA"] and errors["4-step SARSA"] < errors["SARSA"]
+    assert errors["Watkins Q(0.9)"] < errors["Q-learning"]
@@ -0,0 +1,42 @@
+import tempfile
+import time
+
+import numpy as np
+
+from algorithms import value_iteration
+from grid_world import make_grid_world, P
+from samplers import TRANSITION_SAMPLER_TABLES
+
+if __name__ == "__main__":
+    print("Default 4x4 world rebuilt by the generator :")
+    world = make_grid_world(4, 4)
+    assert np.array_equal(world.P[:, :, :, 0], P[:, :, :, 0])
+    V, Pi, iterations, sweeps = value_iteration(world.S, world.A, world.model, world.T, gamma=0.99, theta=0.0000001)
+    print(V.reshape(4, 4))
+
+    print("Slippery 6x5 world with obstacles :")
+    world = make_grid_world(6, 5, obstacles=[7, 8, 9, 20], slip_prob=0.1)
+    V, Pi, iterations, sweeps = value_iteration(world.S, world.A, world.model, world.T, gamma=0.99, theta=0.0000001)
+    print(V.reshape(5, 6))
+
+    print("Disk cache of a 300x300 world :")
+    cache_dir = tempfile.mkdtemp()
+    start = time.perf_counter()
+    make_grid_world(300, 300, cache_dir=cache_dir).model
+    print("build :", time.perf_counter() - start)
+    start = time.perf_counter()
+    world = make_grid_world(300, 300, cache_dir=cache_dir)
+    world.model
+    print("load :", time.perf_counter() - start)
+    assert isinstance(world.model.next_states, np.memmap)
+    print(world.env.step(world.env.reset(3), np.array([1, 3, 0])))
+
+    print("Row ids, expected rewards and sampler tables of a slippery world come from the cache too :")
+    make_grid_world(100, 100, slip_prob=0.1, cache_dir=cache_dir).env
+    world = make_grid_world(100, 100, slip_prob=0.1, cache_dir=cache_dir)
+    built = make_grid_world(100, 100, slip_prob=0.1)
+    assert isinstance(world.model.row_ids, np.memmap) and isinstance(world.env.transitions.prob, np.memmap)
+    assert np.array_equal(world.model.row_ids, built.model.row_ids)
+    assert np.array_equal(world.model.expected_rewards, built.model.expected_rewards)
+    for name in TRANSITION_SAMPLER_TABLES:
+        assert np.array_equal(getattr(world.env.transitions, name), getattr(built.env.transitions, name))
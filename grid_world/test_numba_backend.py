@@ -0,0 +1,67 @@
+import numpy as np
+
+from algorithms import tabular_q_learning_control, tabular_sarsa_control
+from instrumentation import Stats
+from kernels import NUMBA_AVAILABLE
+from grid_world import S, A, reset, step, is_terminal, vector_env
+from policies import EpsilonGreedyPolicy, StochasticPolicy, tabular_random_uniform_policy
+from utils import step_until_the_end_of_the_episode_and_generate_trajectory
+
+
+def returns_and_lengths(pi, backend: str, episodes: int = 5000) -> (np.ndarray, np.ndarray):
+    returns, lengths = np.zeros(episodes), np.zeros(episodes)
+    for episode_id in range(episodes):
+        s_list, _, _, r_list = step_until_the_end_of_the_episode_and_generate_trajectory(
+            reset(), pi, step, is_terminal, 100, env=vector_env, backend=backend)
+        returns[episode_id], lengths[episode_id] = np.sum(r_list), s_list.shape[0]
+    return returns, lengths
+
+
+if __name__ == "__main__":
+    print("Numba available :", NUMBA_AVAILABLE)
+
+    print("Cumulative policy matrices follow policy updates :")
+    Q = np.random.random((len(S), len(A)))
+    policy = EpsilonGreedyPolicy(Q, 0.2)
+    policy.cumulative_matrix()
+    Q[1] = -Q[1]
+    policy.update(np.array([1]))
+    policy.greedy_actions[2] = (policy.greedy_actions[2] + 1) % len(A)
+    assert np.allclose(policy.cumulative_matrix(), np.cumsum(policy.to_matrix(), axis=1))
+    policy = StochasticPolicy(tabular_random_uniform_policy(len(S), len(A)))
+    policy.cumulative_matrix()
+    policy.pi[1] = np.eye(len(A))[0]
+    policy.update(1)
+    assert np.allclose(policy.cumulative_matrix(), np.cumsum(policy.to_matrix(), axis=1))
+
+    print("Random policy episodes, numba backend against python :")
+    policy = StochasticPolicy(tabular_random_uniform_policy(len(S), len(A)))
+    returns, lengths = returns_and_lengths(policy, "numba")
+    returns_python, lengths_python = returns_and_lengths(policy, "python")
+    print(np.mean(returns), np.mean(returns_python), np.mean(lengths), np.mean(lengths_python))
+    assert abs(np.mean(returns) - np.mean(returns_python)) < 0.25
+    assert abs(np.mean(lengths) - np.mean(lengths_python)) < 0.1 * np.mean(lengths_python)
+
+    print("SARSA (numba backend) :")
+    Q, Pi = tabular_sarsa_control(len(S), len(A), reset, step, is_terminal, max_episodes=10000,
+                                  max_steps_per_episode=100, env=vector_env, backend="numba")
+    print(Q)
+    print(Pi)
+
+    print("Q-learning (numba backend) :")
+    stats = Stats()
+    Q, Pi = tabular_q_learning_control(len(S), len(A), reset, step, is_terminal, max_episodes=10000,
+                                       max_steps_per_episode=100, env=vector_env, backend="numba", stats=stats)
+    print(Q)
+    print(Pi)
+    print(stats.as_dict())
+    assert stats.episodes == 10000 and stats.env_steps >= 10000
+
+    print("A reset the compiled loops would ignore is refused :")
+    try:
+        tabular_q_learning_control(len(S), len(A), lambda: 1, step, is_terminal, max_episodes=10, env=vector_env,
+                                   backend="numba")
+    except AssertionError:
+        print("refused")
+    else:
+        raise AssertionError("a custom reset_func was accepted by the numba backend")
@@ -0,0 +1,21 @@
+import numpy as np
+
+from algorithms import iterative_policy_evaluation, policy_iteration
+from grid_world import S, A, T, P
+from models import dense_to_sparse
+from policies import tabular_random_uniform_policy
+
+if __name__ == "__main__":
+    P_sparse = dense_to_sparse(P)
+    print("Non-zero transitions :", P_sparse.nnz)
+    assert np.array_equal(P_sparse.to_dense()[:, :, :, 0], P[:, :, :, 0])
+
+    Pi = tabular_random_uniform_policy(S.shape[0], A.shape[0])
+    V = iterative_policy_evaluation(S, A, P_sparse, T, Pi)
+    print(V)
+    assert np.allclose(V, iterative_policy_evaluation(S, A, P, T, Pi), atol=1e-3)
+
+    V, Pi = policy_iteration(S, A, P_sparse, T, sweep="gauss_seidel", block_size=2)
+    print(V)
+    print(Pi)
+    assert np.allclose(V, policy_iteration(S, A, P, T)[0], atol=1e-3)
@@ -0,0 +1,24 @@
+import os
+import tempfile
+
+from sweeps import make_env, run_sweep, summarize
+
+if __name__ == "__main__":
+    envs = {name: make_env(name) for name in ("grid_world:4", "grid_world:8")}
+    grid = {"alpha": [0.1], "epsilon": [0.1, 0.5], "gamma": [0.9, 0.99], "max_episodes": [500],
+            "max_steps_per_episode": [200]}
+    directory = tempfile.mkdtemp()
+
+    records = run_sweep(envs, ["tabular_q_learning_control"], grid, [0, 1, 2], os.path.join(directory, "a.jsonl"),
+                        n_jobs=4)
+    for row in summarize(records):
+        print(row)
+    assert len(records) == 24
+
+    again = run_sweep(envs, ["tabular_q_learning_control"], grid, [0, 1, 2], os.path.join(directory, "b.jsonl"),
+                      n_jobs=3)
+
+    def by_run(runs: list) -> list:
+        return sorted(((r["env"], sorted(r["params"].items()), r["seed"]), r["start_value"]) for r in runs)
+
+    assert by_run(records) == by_run(again)
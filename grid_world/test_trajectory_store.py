@@ -0,0 +1,54 @@
+import tempfile
+
+import numpy as np
+
+from algorithms import linear_policy_evaluation, streaming_first_visit_monte_carlo_prediction, \
+    streaming_off_policy_monte_carlo_control, streaming_tabular_td_zero_prediction, value_iteration
+from grid_world import is_terminal, step, reset, S, A, T, P
+from policies import tabular_random_uniform_policy
+from trajectory_store import TrajectoryStore, TrajectoryWriter, record_episodes
+from utils import step_until_the_end_of_the_episode_and_generate_trajectory
+
+if __name__ == "__main__":
+    np.random.seed(0)
+    Pi = tabular_random_uniform_policy(S.shape[0], A.shape[0])
+
+    # Episodes read back from the store are the ones that were written, across chunk boundaries.
+    written = [step_until_the_end_of_the_episode_and_generate_trajectory(reset(), Pi, step, is_terminal, 100)
+               for _ in range(200)]
+    directory = tempfile.mkdtemp()
+    with TrajectoryWriter(directory, chunk_size=256) as writer:
+        for s_list, a_list, s_p_list, r_list in written:
+            writer.append(s_list, a_list, s_p_list, r_list, np.full(s_list.shape[0], 1.0 / len(A)))
+    read = list(TrajectoryStore(directory).episodes())
+    assert len(read) == len(written)
+    for (s_list, a_list, s_p_list, r_list), (s_r, a_r, s_p_r, r_r, _) in zip(written, read):
+        assert np.array_equal(s_r, s_list) and np.array_equal(a_r, a_list)
+        assert np.array_equal(s_p_r, s_p_list) and np.array_equal(r_r, r_list)
+
+    directory = tempfile.mkdtemp()
+    store = record_episodes(directory, Pi, reset, step, is_terminal, max_episodes=5000, max_steps_per_episode=100,
+                            chunk_size=16384)
+    print("Recorded", store.episodes_count, "episodes,", store.transitions_count, "transitions in",
+          len(store.chunk_entries), "chunks")
+    assert store.episodes_count == 5000 and len(store.chunk_entries) > 1
+    assert TrajectoryStore(directory).transitions_count == store.transitions_count
+
+    V_exact = linear_policy_evaluation(S, A, P, T, Pi, 0.99, 1e-10)
+
+    print("Streaming first visit Monte Carlo prediction :")
+    V = streaming_first_visit_monte_carlo_prediction(store, len(S), is_terminal)
+    print(V)
+    assert np.max(np.abs(V - V_exact)) < 0.3
+
+    print("Streaming TD(0) prediction :")
+    V = streaming_tabular_td_zero_prediction(store, len(S), is_terminal, alpha=0.01, epochs=2)
+    print(V)
+    assert np.max(np.abs(V - V_exact)) < 0.5
+
+    print("Streaming off-policy Monte Carlo control :")
+    Q, Pi = streaming_off_policy_monte_carlo_control(store, len(S), len(A), is_terminal)
+    print(Q)
+    print(Pi)
+    V_star = value_iteration(S, A, P, T, theta=1e-8)[0]
+    assert V_star[0] - linear_policy_evaluation(S, A, P, T, Pi, 0.99, 1e-10)[0] < 0.1
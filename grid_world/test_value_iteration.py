@@ -0,0 +1,16 @@
+import numpy as np
+
+from algorithms import policy_iteration, value_iteration
+from grid_world import S, A, T, P
+
+if __name__ == "__main__":
+    V, Pi, iterations, sweeps = value_iteration(S, A, P, T)
+    print(V)
+    print(Pi)
+    print("Sweeps :", sweeps)
+    assert np.allclose(V, policy_iteration(S, A, P, T)[0], atol=1e-3)
+
+    print("Warm start :")
+    V, Pi, iterations, sweeps = value_iteration(S, A, P, T, sweep="gauss_seidel", block_size=2, V0=V)
+    print(V)
+    print("Sweeps :", sweeps)
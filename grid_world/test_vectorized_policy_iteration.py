@@ -0,0 +1,22 @@
+import numpy as np
+
+from algorithms import iterative_policy_evaluation, policy_iteration
+from grid_world import S, A, T, P
+from policies import tabular_random_uniform_policy
+
+if __name__ == "__main__":
+    Pi = tabular_random_uniform_policy(S.shape[0], A.shape[0])
+    V_ref = iterative_policy_evaluation(S, A, P, T, Pi, backend="python")
+    for sweep in ("jacobi", "gauss_seidel"):
+        V = iterative_policy_evaluation(S, A, P, T, Pi, sweep=sweep, block_size=3)
+        print(sweep, V)
+        assert np.allclose(V, V_ref, atol=1e-3)
+
+    V_ref, Pi_ref = policy_iteration(S, A, P, T, backend="python")
+    for sweep in ("jacobi", "gauss_seidel"):
+        V, Pi = policy_iteration(S, A, P, T, sweep=sweep, block_size=3)
+        print(sweep, V)
+        print(Pi)
+        assert np.allclose(V, V_ref, atol=1e-3)
+        assert np.allclose(iterative_policy_evaluation(S, A, P, T, Pi),
+                           iterative_policy_evaluation(S, A, P, T, Pi_ref), atol=1e-3)
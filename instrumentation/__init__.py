@@ -0,0 +1,155 @@
+import time
+from functools import wraps
+from inspect import signature
+from typing import Callable
+
+import numpy as np
+
+
+class Stats:
+    # Filled in by the algorithm it is passed to as stats=...; on_sweep and on_episode, when given,
+    # are called with this object after every sweep and every episode.
+    def __init__(self, on_sweep: Callable = None, on_episode: Callable = None):
+        self.on_sweep = on_sweep
+        self.on_episode = on_episode
+        self.sweeps = 0
+        self.backups = 0
+        self.deltas = []
+        self.episodes = 0
+        self.episode_lengths = []
+        self.env_steps = 0
+        self.env_time = 0.0
+        self.wall_time = 0.0
+        self._depth = 0
+
+    @property
+    def update_time(self) -> float:
+        return self.wall_time - self.env_time
+
+    def sweep(self, delta: float, backups: int) -> None:
+        self.sweeps += 1
+        self.backups += backups
+        self.deltas.append(float(delta))
+        if self.on_sweep is not None:
+            self.on_sweep(self)
+
+    def episode(self, length: int) -> None:
+        self.episodes += 1
+        self.episode_lengths.append(int(length))
+        if self.on_episode is not None:
+            self.on_episode(self)
+
+    def timed_step(self, step_func: Callable) -> Callable:
+        return _TimedStep(self, step_func)
+
+    def as_dict(self) -> dict:
+        return {
+            "sweeps": self.sweeps,
+            "backups": self.backups,
+            "episodes": self.episodes,
+            "env_steps": self.env_steps,
+            "env_time": self.env_time,
+            "update_time": self.update_time,
+            "wall_time": self.wall_time
+        }
+
+
+class _TimedStep:
+    # A class rather than a closure so that it can be sent to worker processes; the steps those
+    # take are counted in their own copy of the stats, not in this one.
+    def __init__(self, stats: Stats, step_func: Callable):
+        self.stats = stats
+        self.step_func = step_func
+
+    def __call__(self, states, actions, *args):
+        start = time.perf_counter()
+        result = self.step_func(states, actions, *args)
+        self.stats.env_time += time.perf_counter() - start
+        self.stats.env_steps += np.size(states)
+        return result
+
+
+def instrumented(func: Callable) -> Callable:
+    # Adds the wall time of func to its stats argument. Calls nested inside an instrumented call
+    # sharing the same stats are not counted twice.
+    position = list(signature(func).parameters).index("stats")
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        stats = args[position] if len(args) > position else kwargs.get("stats")
+        if stats is None:
+            return func(*args, **kwargs)
+        stats._depth += 1
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats._depth -= 1
+            if stats._depth == 0:
+                stats.wall_time += time.perf_counter() - start
+
+    return wrapper
+
+
+class EarlyStopping:
+    # Passed as early_stopping=... to a sample-based algorithm, which calls update after every episode
+    # (or batch of episodes) and stops as soon as it returns True; reason then tells which criterion
+    # fired, or is "max_episodes" when none did. Every window episodes the table is compared with its
+    # value window episodes earlier (tolerance) and its greedy policy with the previous check (patience).
+    def __init__(
+            self,
+            tolerance: float = None,
+            window: int = 100,
+            patience: int = None,
+            max_time: float = None,
+            max_steps: int = None
+    ):
+        assert window > 0
+        assert patience is None or patience > 0
+        self.tolerance = tolerance
+        self.window = window
+        self.patience = patience
+        self.max_time = max_time
+        self.max_steps = max_steps
+        self.reason = None
+        self.episodes = 0
+        self.steps = 0
+
+    def start(self, table: np.ndarray) -> None:
+        self.table = table
+        self._previous = table.copy()
+        self._greedy = np.argmax(table, axis=1) if table.ndim == 2 else None
+        self._stable_checks = 0
+        self._since_check = 0
+        self._start = time.perf_counter()
+        self.reason = "max_episodes"
+        self.episodes = 0
+        self.steps = 0
+
+    def _stop(self, reason: str) -> bool:
+        self.reason = reason
+        return True
+
+    def update(self, steps: int, episodes: int = 1) -> bool:
+        self.steps += int(steps)
+        self.episodes += int(episodes)
+        self._since_check += int(episodes)
+        if self.max_steps is not None and self.steps >= self.max_steps:
+            return self._stop("step_budget")
+        if self.max_time is not None and time.perf_counter() - self._start >= self.max_time:
+            return self._stop("time_budget")
+        if self._since_check < self.window:
+            return False
+        self._since_check = 0
+        if self.tolerance is not None:
+            delta = np.max(np.abs(self.table - self._previous))
+            self._previous[...] = self.table
+            if delta < self.tolerance:
+                return self._stop("converged")
+        if self.patience is not None and self._greedy is not None:
+            greedy = np.argmax(self.table, axis=1)
+            self._stable_checks = self._stable_checks + 1 if np.array_equal(greedy, self._greedy) else 0
+            self._greedy = greedy
+            if self._stable_checks >= self.patience:
+                return self._stop("policy_stable")
+        return False
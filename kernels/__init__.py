@@ -0,0 +1,138 @@
+import weakref
+from typing import Callable
+
+import numpy as np
+
+from envs import VectorEnv
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+NUMBA_AVAILABLE = numba is not None
+
+_compiled_envs = weakref.WeakKeyDictionary()
+
+
+def _jit(func):
+    # Compiled kernels are cached on disk next to this module, so only the first run pays for the JIT.
+    return numba.njit(cache=True)(func) if NUMBA_AVAILABLE else func
+
+
+def _env_of(func: Callable):
+    # The environment a bound reset or step works on; a GridWorld forwards to its VectorEnv.
+    owner = getattr(func, '__self__', None)
+    return getattr(owner, 'env', owner)
+
+
+def use_numba(backend: str, env: VectorEnv = None, *funcs: Callable) -> bool:
+    # The compiled loops reset to env.start_state and sample env.model themselves, so the reset and
+    # step functions passed in funcs must be env's own: anything else would be silently ignored.
+    assert backend in ("python", "numba")
+    assert backend == "python" or env is not None
+    assert backend == "python" or all(_env_of(func) is env for func in funcs)
+    return backend == "numba" and NUMBA_AVAILABLE
+
+
+def compiled_arrays(env: VectorEnv) -> tuple:
+    # (indptr, next_states, cumulative, rewards, terminal_mask, start_state): cumulative[e] is the
+    # running sum of the probabilities of the entries of e's row up to and including e.
+    arrays = _compiled_envs.get(env)
+    if arrays is None:
+        model = env.model
+        totals = np.concatenate(([0.0], np.cumsum(model.probabilities)))
+        cumulative = totals[1:] - totals[model.indptr[model.row_ids]]
+        arrays = (model.indptr.astype(np.int64), model.next_states.astype(np.int64), cumulative,
+                  model.rewards.astype(np.float64), env.terminal_mask, int(env.start_state))
+        _compiled_envs[env] = arrays
+    return arrays
+
+
+def kernel_seed(rng: np.random.Generator = None) -> int:
+    # Compiled code has its own generator; seeding it from np.random (or rng) keeps runs reproducible.
+    if rng is not None:
+        return int(rng.integers(2 ** 31 - 1))
+    return int(np.random.randint(2 ** 31 - 1))
+
+
+@_jit
+def _sample_row(indptr, cumulative, row):
+    lo = indptr[row]
+    hi = indptr[row + 1]
+    u = np.random.random() * cumulative[hi - 1]
+    e = lo
+    while e < hi - 1 and cumulative[e] <= u:
+        e += 1
+    return e
+
+
+@_jit
+def _epsilon_greedy_action(Q, s, epsilon):
+    if epsilon > 0 and np.random.random() < epsilon:
+        return np.random.randint(Q.shape[1])
+    return np.argmax(Q[s])
+
+
+@_jit
+def q_learning_kernel(indptr, next_states, cumulative, rewards, terminal_mask, start_state, Q,
+                      max_episodes, max_steps_per_episode, gamma, alpha, epsilon, seed):
+    np.random.seed(seed)
+    actions_count = Q.shape[1]
+    steps = 0
+    for episode_id in range(max_episodes):
+        s = start_state
+        step = 0
+        while not terminal_mask[s] and step < max_steps_per_episode:
+            a = _epsilon_greedy_action(Q, s, epsilon)
+            e = _sample_row(indptr, cumulative, s * actions_count + a)
+            s_p = next_states[e]
+            Q[s, a] += alpha * (rewards[e] + gamma * np.max(Q[s_p]) - Q[s, a])
+            s = s_p
+            step += 1
+        steps += step
+    return steps
+
+
+@_jit
+def sarsa_kernel(indptr, next_states, cumulative, rewards, terminal_mask, start_state, Q,
+                 max_episodes, max_steps_per_episode, gamma, alpha, epsilon, seed):
+    np.random.seed(seed)
+    actions_count = Q.shape[1]
+    steps = 0
+    for episode_id in range(max_episodes):
+        s = start_state
+        step = 0
+        a = _epsilon_greedy_action(Q, s, epsilon)
+        while not terminal_mask[s] and step < max_steps_per_episode:
+            e = _sample_row(indptr, cumulative, s * actions_count + a)
+            s_p = next_states[e]
+            a_p = _epsilon_greedy_action(Q, s_p, epsilon)
+            Q[s, a] += alpha * (rewards[e] + gamma * Q[s_p, a_p] - Q[s, a])
+            s = s_p
+            a = a_p
+            step += 1
+        steps += step
+    return steps
+
+
+@_jit
+def rollout_kernel(indptr, next_states, cumulative, rewards, terminal_mask, pi_cumulative, s0, max_steps,
+                   states_out, actions_out, next_states_out, rewards_out, seed):
+    np.random.seed(seed)
+    actions_count = pi_cumulative.shape[1]
+    s = s0
+    step = 0
+    while not terminal_mask[s] and step < max_steps:
+        u = np.random.random() * pi_cumulative[s, actions_count - 1]
+        a = 0
+        while a < actions_count - 1 and pi_cumulative[s, a] <= u:
+            a += 1
+        e = _sample_row(indptr, cumulative, s * actions_count + a)
+        states_out[step] = s
+        actions_out[step] = a
+        next_states_out[step] = next_states[e]
+        rewards_out[step] = rewards[e]
+        s = next_states[e]
+        step += 1
+    return step
@@ -1,5 +1,9 @@
 import numpy as np
 
+from dtypes import DTypePolicy
+from envs import VectorEnv
+from models import SparseTransitionModel
+
 num_states = 5
 S = np.arange(num_states)
 A = np.array([0, 1])  # 0: left, 1 : right
@@ -13,16 +17,20 @@ P[1, 0, 0, 1] = -1.0
 P[num_states - 2, 1, num_states - 1, 1] = 1.0
 
 
-def reset() -> int:
-    return num_states // 2
-
-
-def is_terminal(state: int) -> bool:
-    return state in T
+def make_line_world(num_states: int, dtypes: DTypePolicy = None) -> VectorEnv:
+    assert num_states >= 3
+    inner = np.arange(1, num_states - 1)
+    next_states = np.stack([inner - 1, inner + 1], axis=1).ravel()
+    rewards = np.where(next_states == 0, -1.0, np.where(next_states == num_states - 1, 1.0, 0.0))
+    counts = np.zeros((num_states, 2), dtype=np.int64)
+    counts[1:-1] = 1
+    indptr = np.zeros(num_states * 2 + 1, dtype=np.int64)
+    np.cumsum(counts.ravel(), out=indptr[1:])
+    model = SparseTransitionModel(num_states, 2, indptr, next_states, np.ones(next_states.shape[0]), rewards)
+    return VectorEnv(model, np.array([0, num_states - 1]), num_states // 2, dtypes)
 
 
-def step(state: int, action: int) -> (int, float, bool):
-    assert not is_terminal(state)
-    next_state = np.random.choice(S, p=P[state, action, :, 0])
-    reward = P[state, action, next_state, 1]
-    return next_state, reward, is_terminal(state)
+vector_env = VectorEnv(P, T, num_states // 2)
+reset = vector_env.reset
+is_terminal = vector_env.is_terminal
+step = vector_env.step
@@ -0,0 +1,40 @@
+import numpy as np
+
+from algorithms import batched_tabular_q_learning_control, batched_tabular_sarsa_control, \
+    batched_tabular_td_zero_prediction, linear_policy_evaluation, tabular_td_zero_prediction
+from line_world import vector_env, is_terminal, step, reset, S, A, T, P
+from policies import tabular_random_uniform_policy
+
+if __name__ == "__main__":
+    print("Evaluation policy random :")
+    Pi = tabular_random_uniform_policy(S.shape[0], A.shape[0])
+    V_exact = linear_policy_evaluation(S, A, P, T, Pi, 0.99, 1e-10)
+
+    # At the same number of episodes, 64 environments stepping in lockstep learn as much as one.
+    V_serial = tabular_td_zero_prediction(Pi, reset, step, is_terminal, max_episodes=2000, max_steps_per_episode=100,
+                                          alpha=0.01)
+    V_batched = batched_tabular_td_zero_prediction(Pi, vector_env.reset, vector_env.step, vector_env.is_terminal,
+                                                   n_envs=64, max_episodes=2000, max_steps_per_episode=100,
+                                                   alpha=0.01)
+    serial_error = np.max(np.abs(V_serial - V_exact))
+    batched_error = np.max(np.abs(V_batched - V_exact))
+    print("Max error after 2000 episodes, serial :", serial_error, "batched :", batched_error)
+    assert batched_error < serial_error + 0.1
+
+    V = batched_tabular_td_zero_prediction(Pi, vector_env.reset, vector_env.step, vector_env.is_terminal,
+                                           n_envs=256, max_episodes=100000, max_steps_per_episode=100,
+                                           alpha=0.01)
+    print(V)
+
+    print("SARSA :")
+    Q, Pi = batched_tabular_sarsa_control(len(S), len(A), vector_env.reset, vector_env.step, vector_env.is_terminal,
+                                          n_envs=256, max_episodes=50000, max_steps_per_episode=100)
+    print(Q)
+    print(Pi)
+
+    print("Q-learning :")
+    Q, Pi = batched_tabular_q_learning_control(len(S), len(A), vector_env.reset, vector_env.step,
+                                               vector_env.is_terminal,
+                                               n_envs=256, max_episodes=50000, max_steps_per_episode=100)
+    print(Q)
+    print(Pi)
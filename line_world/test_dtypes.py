@@ -0,0 +1,53 @@
+import numpy as np
+
+from algorithms import batched_tabular_q_learning_control, linear_policy_evaluation, \
+    monte_carlo_with_exploring_starts_control, off_policy_monte_carlo_control, \
+    on_policy_first_visit_monte_carlo_epsilon_soft_control, policy_iteration, tabular_sarsa_control
+from dtypes import COMPACT
+from line_world import make_line_world
+from policies import tabular_random_uniform_policy
+
+if __name__ == "__main__":
+    env = make_line_world(7)
+    compact_env = make_line_world(7, dtypes=COMPACT)
+    S, A, T = np.arange(env.n_states), np.arange(env.n_actions), np.flatnonzero(env.terminal_mask)
+    print("States returned by reset(n) :", compact_env.reset(4).dtype)
+    assert compact_env.reset(4).dtype == np.int32
+
+    print("Row ids and sampler tables, float64 and compact :")
+    for e, index_dtype, value_dtype in ((env, np.int64, np.float64), (compact_env, np.int32, np.float32)):
+        sampler = e.transitions
+        print(e.model.row_ids.dtype, sampler.entries.dtype, sampler.alias_entries.dtype,
+              sampler.deterministic_entries.dtype, sampler.prob.dtype)
+        assert e.model.row_ids.dtype == sampler.entries.dtype == sampler.alias_entries.dtype == index_dtype
+        assert sampler.deterministic_entries.dtype == index_dtype and sampler.prob.dtype == value_dtype
+
+    print("Linear policy evaluation and policy iteration, compact against float64 :")
+    Pi = tabular_random_uniform_policy(env.n_states, env.n_actions)
+    V = linear_policy_evaluation(S, A, env.model, T, Pi)
+    V_c = linear_policy_evaluation(S, A, compact_env.model, T, Pi, dtypes=COMPACT)
+    print(V_c.dtype, np.max(np.abs(V - V_c)))
+    assert V_c.dtype == np.float32 and np.max(np.abs(V - V_c)) < 1e-5
+    V, Pi = policy_iteration(S, A, env.model, T)
+    V_c, Pi_c = policy_iteration(S, A, compact_env.model, T, dtypes=COMPACT)
+    print(V_c.dtype, np.max(np.abs(V - V_c)))
+    assert np.max(np.abs(V - V_c)) < 1e-4 and np.array_equal(Pi, Pi_c)
+
+    print("Control with compact tables always ends up going right :")
+    for func, kwargs in ((tabular_sarsa_control, {"alpha": 0.1, "epsilon": 0.2}),
+                         (batched_tabular_q_learning_control, {"alpha": 0.1, "epsilon": 0.2}),
+                         (on_policy_first_visit_monte_carlo_epsilon_soft_control, {"epsilon": 0.2}),
+                         (off_policy_monte_carlo_control, {})):
+        np.random.seed(0)
+        Q, Pi = func(env.n_states, env.n_actions, compact_env.reset, compact_env.step, compact_env.is_terminal,
+                     max_episodes=3000, max_steps_per_episode=200, dtypes=COMPACT, **kwargs)
+        print(func.__name__, Q.dtype, Pi.dtype, np.argmax(Pi[1:-1], axis=1))
+        assert Q.dtype == np.float32
+        assert np.all(np.argmax(Pi[1:-1], axis=1) == 1)
+
+    np.random.seed(0)
+    Q, Pi = monte_carlo_with_exploring_starts_control(env.n_states, env.n_actions, compact_env.step,
+                                                      compact_env.is_terminal, max_episodes=3000,
+                                                      max_steps_per_episode=200, dtypes=COMPACT)
+    print(monte_carlo_with_exploring_starts_control.__name__, Q.dtype, Pi.dtype)
+    assert Q.dtype == np.float32
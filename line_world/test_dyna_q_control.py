@@ -0,0 +1,17 @@
+import numpy as np
+
+from algorithms import dyna_q_control
+from instrumentation import Stats
+from line_world import make_line_world
+
+if __name__ == "__main__":
+    env = make_line_world(15)
+    for kwargs in ({}, {"model": "last"}, {"sampling": "prioritized"}, {"model": "last", "buffer_capacity": 8}):
+        np.random.seed(0)
+        stats = Stats()
+        Q, Pi = dyna_q_control(env.n_states, env.n_actions, env.reset, env.step, env.is_terminal, max_episodes=100,
+                               max_steps_per_episode=1000, planning_steps=20, epsilon=0.5, stats=stats, **kwargs)
+        print(kwargs, "env steps :", stats.env_steps)
+        print(np.argmax(Pi, axis=1))
+        if "buffer_capacity" not in kwargs:
+            assert np.all(np.argmax(Pi[1:-1], axis=1) == 1)
@@ -0,0 +1,57 @@
+import numpy as np
+
+from algorithms import linear_policy_evaluation, tabular_n_step_sarsa_control, tabular_n_step_td_prediction, \
+    tabular_sarsa_control, tabular_sarsa_lambda_control, tabular_td_lambda_prediction, tabular_td_zero_prediction, \
+    tabular_watkins_q_lambda_control
+from line_world import make_line_world
+from policies import tabular_random_uniform_policy
+
+if __name__ == "__main__":
+    env = make_line_world(21)
+    S, A, T = np.arange(env.n_states), np.arange(env.n_actions), np.flatnonzero(env.terminal_mask)
+    Pi = tabular_random_uniform_policy(env.n_states, env.n_actions)
+    V_exact = linear_policy_evaluation(S, A, env.model, T, Pi)
+
+    print("n = 1 and lambda = 0 are TD(0) :")
+    np.random.seed(0)
+    V_td_zero = tabular_td_zero_prediction(Pi, env.reset, env.step, env.is_terminal, max_episodes=50,
+                                           max_steps_per_episode=1000)
+    np.random.seed(0)
+    V_one_step = tabular_n_step_td_prediction(Pi, env.reset, env.step, env.is_terminal, n=1, max_episodes=50,
+                                              max_steps_per_episode=1000)
+    np.random.seed(0)
+    V_lambda_zero = tabular_td_lambda_prediction(Pi, env.reset, env.step, env.is_terminal, lambda_=0.0,
+                                                 max_episodes=50, max_steps_per_episode=1000)
+    assert np.allclose(V_one_step, V_td_zero) and np.allclose(V_lambda_zero, V_td_zero)
+
+    print('Error after 100 episodes of "always right", alpha = 0.1 :')
+    Pi = np.zeros((env.n_states, env.n_actions))
+    Pi[:, 1] = 1.0
+    V_exact = linear_policy_evaluation(S, A, env.model, T, Pi)
+    for name, func, kwargs in (("TD(0)", tabular_td_zero_prediction, {}),
+                               ("8-step TD", tabular_n_step_td_prediction, {"n": 8}),
+                               ("TD(0.9), accumulating", tabular_td_lambda_prediction, {"lambda_": 0.9}),
+                               ("TD(0.9), replacing", tabular_td_lambda_prediction,
+                                {"lambda_": 0.9, "trace": "replacing"})):
+        np.random.seed(0)
+        V = func(Pi, env.reset, env.step, env.is_terminal, max_episodes=100, max_steps_per_episode=1000, alpha=0.1,
+                 **kwargs)
+        # Going right from the start state, the states on its left are never visited.
+        error = np.max(np.abs(V - V_exact)[env.start_state:])
+        print("{:<24} {:.4f}".format(name, error))
+        if func is tabular_td_zero_prediction:
+            td_zero_error = error
+        else:
+            assert error < td_zero_error
+
+    print("Control :")
+    for func, kwargs in ((tabular_sarsa_control, {}),
+                         (tabular_n_step_sarsa_control, {"n": 8}),
+                         (tabular_sarsa_lambda_control, {"lambda_": 0.9}),
+                         (tabular_watkins_q_lambda_control, {"lambda_": 0.9, "trace": "replacing"})):
+        np.random.seed(0)
+        Q, Pi = func(env.n_states, env.n_actions, env.reset, env.step, env.is_terminal, max_episodes=300,
+                     max_steps_per_episode=1000, alpha=0.1, epsilon=0.2, **kwargs)
+        print(func.__name__, np.argmax(Pi, axis=1))
+        if func is not tabular_sarsa_control:
+            assert np.all(np.argmax(Pi[env.start_state:-1], axis=1) == 1)
@@ -0,0 +1,43 @@
+from algorithms import first_visit_monte_carlo_prediction, iterative_policy_evaluation, \
+    on_policy_first_visit_monte_carlo_epsilon_soft_control, tabular_q_learning_control, value_iteration
+from instrumentation import Stats
+from line_world import S, A, P, T, reset, step, is_terminal
+from policies import tabular_random_uniform_policy
+
+if __name__ == "__main__":
+    print("Iterative policy evaluation, delta per sweep :")
+    stats = Stats(on_sweep=lambda st: print(st.sweeps, st.deltas[-1]) if st.sweeps % 50 == 0 else None)
+    Pi = tabular_random_uniform_policy(S.shape[0], A.shape[0])
+    iterative_policy_evaluation(S, A, P, T, Pi, stats=stats)
+    print(stats.as_dict())
+
+    print("Value iteration :")
+    stats = Stats()
+    V, Pi, iterations, sweeps = value_iteration(S, A, P, T, stats=stats)
+    assert stats.sweeps == sweeps
+    print(stats.as_dict())
+
+    print("On-policy first visit Monte Carlo :")
+    stats = Stats()
+    on_policy_first_visit_monte_carlo_epsilon_soft_control(len(S), len(A), reset, step, is_terminal,
+                                                           max_episodes=1000, max_steps_per_episode=100, stats=stats)
+    assert stats.episodes == 1000 and stats.env_steps == sum(stats.episode_lengths)
+    print(stats.as_dict())
+    print("Mean episode length :", stats.env_steps / stats.episodes)
+
+    print("First visit Monte Carlo prediction, serial and parallel :")
+    for n_jobs in (1, 4):
+        stats = Stats()
+        first_visit_monte_carlo_prediction(tabular_random_uniform_policy(S.shape[0], A.shape[0]), reset, step,
+                                           is_terminal, max_episodes=1000, max_steps_per_episode=100, n_jobs=n_jobs,
+                                           stats=stats)
+        assert stats.episodes == len(stats.episode_lengths) == 1000
+        assert stats.env_steps == sum(stats.episode_lengths) > 0
+        print(n_jobs, stats.as_dict())
+
+    print("Q-learning :")
+    stats = Stats()
+    tabular_q_learning_control(len(S), len(A), reset, step, is_terminal, max_episodes=1000,
+                               max_steps_per_episode=100, stats=stats)
+    assert stats.env_steps == sum(stats.episode_lengths)
+    print(stats.as_dict())
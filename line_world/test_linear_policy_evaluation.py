@@ -0,0 +1,21 @@
+import numpy as np
+
+from algorithms import iterative_policy_evaluation, linear_policy_evaluation, policy_iteration
+from line_world import S, A, T, P
+from models import dense_to_sparse
+from policies import tabular_random_uniform_policy
+
+if __name__ == "__main__":
+    print("Evaluation policy random :")
+    Pi = tabular_random_uniform_policy(S.shape[0], A.shape[0])
+    V_ref = iterative_policy_evaluation(S, A, P, T, Pi)
+    for solver in ("dense", "gmres", "bicgstab"):
+        V = linear_policy_evaluation(S, A, dense_to_sparse(P), T, Pi, solver=solver)
+        print(solver, V)
+        assert np.allclose(V, V_ref, atol=1e-3)
+
+    print("Policy iteration, linear evaluation :")
+    V, Pi = policy_iteration(S, A, P, T, evaluation="linear")
+    print(V)
+    print(Pi)
+    assert np.allclose(V, policy_iteration(S, A, P, T)[0], atol=1e-3)
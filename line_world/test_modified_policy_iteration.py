@@ -0,0 +1,13 @@
+import numpy as np
+
+from algorithms import modified_policy_iteration, policy_iteration
+from line_world import S, A, T, P
+
+if __name__ == "__main__":
+    V_ref = policy_iteration(S, A, P, T)[0]
+    for k in (1, 5, 20):
+        V, Pi, iterations, sweeps = modified_policy_iteration(S, A, P, T, k=k)
+        print(f"k={k} :", V)
+        print(Pi)
+        print("Iterations :", iterations, "Sweeps :", sweeps)
+        assert np.allclose(V, V_ref, atol=1e-3)
@@ -0,0 +1,49 @@
+import numpy as np
+
+from algorithms import first_visit_monte_carlo_prediction, linear_policy_evaluation, off_policy_monte_carlo_control, \
+    on_policy_first_visit_monte_carlo_epsilon_soft_control
+from line_world import is_terminal, step, reset, S, A, T, P
+from policies import tabular_random_uniform_policy
+
+
+def greedy_start_value(Q: np.ndarray) -> float:
+    Pi = np.zeros(Q.shape)
+    Pi[np.arange(Q.shape[0]), np.argmax(Q, axis=1)] = 1.0
+    return linear_policy_evaluation(S, A, P, T, Pi, 0.99, 1e-10)[0]
+
+
+if __name__ == "__main__":
+    print("Evaluation policy random :")
+    Pi = tabular_random_uniform_policy(S.shape[0], A.shape[0])
+    V = first_visit_monte_carlo_prediction(Pi, reset, step, is_terminal,
+                                           max_episodes=10000, max_steps_per_episode=100, n_jobs=4, seed=0)
+    print(V)
+    V_serial = first_visit_monte_carlo_prediction(Pi, reset, step, is_terminal,
+                                                  max_episodes=10000, max_steps_per_episode=100)
+    print("Max difference with the serial estimate :", np.max(np.abs(V - V_serial)))
+    assert np.max(np.abs(V - V_serial)) < 0.1
+    assert np.array_equal(V, first_visit_monte_carlo_prediction(Pi, reset, step, is_terminal, max_episodes=10000,
+                                                                max_steps_per_episode=100, n_jobs=4, seed=0))
+
+    print("On policy control :")
+    Q, Pi = on_policy_first_visit_monte_carlo_epsilon_soft_control(len(S), len(A), reset, step, is_terminal,
+                                                                   max_episodes=10000, max_steps_per_episode=100,
+                                                                   n_jobs=4, sync_interval=50, seed=0)
+    print(Q)
+    print(Pi)
+    Q_serial, _ = on_policy_first_visit_monte_carlo_epsilon_soft_control(len(S), len(A), reset, step, is_terminal,
+                                                                         max_episodes=10000,
+                                                                         max_steps_per_episode=100)
+    assert abs(greedy_start_value(Q) - greedy_start_value(Q_serial)) < 0.05
+
+    print("Off policy control :")
+    Q, Pi = off_policy_monte_carlo_control(len(S), len(A), reset, step, is_terminal,
+                                           max_episodes=10000, max_steps_per_episode=100,
+                                           epsilon_greedy_behaviour_policy=True,
+                                           n_jobs=4, sync_interval=50, seed=0)
+    print(Q)
+    print(Pi)
+    Q_serial, _ = off_policy_monte_carlo_control(len(S), len(A), reset, step, is_terminal,
+                                                 max_episodes=10000, max_steps_per_episode=100,
+                                                 epsilon_greedy_behaviour_policy=True)
+    assert abs(greedy_start_value(Q) - greedy_start_value(Q_serial)) < 0.05
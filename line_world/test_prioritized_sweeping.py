@@ -0,0 +1,26 @@
+import numpy as np
+
+from algorithms import iterative_policy_evaluation, prioritized_sweeping, value_iteration
+from line_world import S, A, T, P
+from models import DenseTransitionModel, dense_to_sparse
+from policies import tabular_random_uniform_policy
+
+if __name__ == "__main__":
+    print("Evaluation policy random :")
+    Pi = tabular_random_uniform_policy(S.shape[0], A.shape[0])
+    V = iterative_policy_evaluation(S, A, P, T, Pi, sweep="prioritized")
+    print(V)
+    assert np.allclose(V, iterative_policy_evaluation(S, A, P, T, Pi), atol=1e-3)
+
+    print("Control :")
+    V, Pi, backups = prioritized_sweeping(S, A, dense_to_sparse(P), T, V0=np.zeros(S.shape[0]))
+    print(V)
+    print(Pi)
+    print("Backups :", backups)
+    assert np.allclose(V, value_iteration(S, A, P, T)[0], atol=1e-3)
+
+    print("One-state backups match the batched ones :")
+    V = np.random.random(S.shape[0])
+    for model in (DenseTransitionModel(P), dense_to_sparse(P)):
+        Q = model.action_values_at(V, 0.99, S)
+        assert all(np.allclose(model.action_values_of(V, 0.99, s), Q[s]) for s in S)
@@ -0,0 +1,44 @@
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from line_world import make_line_world
+from sweeps import run_sweep, summarize
+
+if __name__ == "__main__":
+    envs = {"line_world:7": make_line_world(7), "line_world:15": make_line_world(15)}
+    grid = {"alpha": [0.05, 0.2], "epsilon": [0.2], "max_episodes": [300], "max_steps_per_episode": [100]}
+    algorithm_names = ["tabular_sarsa_control", "tabular_q_learning_control"]
+    directory = tempfile.mkdtemp()
+
+    print("Sweep on 2 processes :")
+    np.random.seed(0)
+    output = os.path.join(directory, "parallel.jsonl")
+    parallel = run_sweep(envs, algorithm_names, grid, [0, 1], output, n_jobs=2)
+    for row in summarize(parallel):
+        print(row)
+    assert len(parallel) == 16
+
+    print("Same sweep on 1 process, from another global random state :")
+    np.random.seed(123)
+    serial = run_sweep(envs, algorithm_names, grid, [0, 1], os.path.join(directory, "serial.jsonl"))
+
+    def by_run(records: list) -> dict:
+        return {json.dumps([r["algorithm"], r["env"], r["params"], r["seed"]], sort_keys=True): r["start_value"]
+                for r in records}
+
+    assert by_run(parallel) == by_run(serial)
+
+    print("Sweep interrupted while writing its last record, then resumed :")
+    with open(output) as f:
+        lines = f.readlines()
+    with open(output, "w") as f:
+        f.writelines(lines[:10])
+        f.write(lines[10][:20])
+    resumed = run_sweep(envs, algorithm_names, grid, [0, 1], output, n_jobs=2)
+    print(len(resumed), "records")
+    assert by_run(resumed) == by_run(parallel)
+    with open(output) as f:
+        assert len([json.loads(line) for line in f]) == 16
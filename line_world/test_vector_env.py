@@ -0,0 +1,30 @@
+import numpy as np
+
+from line_world import vector_env, P, A, reset, step, is_terminal
+
+if __name__ == "__main__":
+    n = 1000
+    states = vector_env.reset(n)
+    episodes = 0
+    total_reward = 0.0
+    for _ in range(100):
+        actions = np.random.randint(A.shape[0], size=n)
+        next_states, rewards, dones = vector_env.step(states, actions, auto_reset=False)
+        assert np.all(P[states, actions, next_states, 0] > 0)
+        next_states[dones] = vector_env.reset(np.count_nonzero(dones))
+        assert not np.any(vector_env.is_terminal(next_states))
+        episodes += np.count_nonzero(dones)
+        total_reward += np.sum(rewards)
+        states = next_states
+    print("Episodes :", episodes)
+    print("Mean reward per episode :", total_reward / episodes)
+
+    print("Scalar steps through the module functions :")
+    s = reset()
+    trajectory = [s]
+    done = False
+    while not done:
+        s, r, done = step(s, np.random.randint(vector_env.n_actions))
+        assert done == is_terminal(s)
+        trajectory.append(int(s))
+    print(trajectory)
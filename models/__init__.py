@@ -0,0 +1,174 @@
+from typing import Union
+
+import numpy as np
+
+from dtypes import DTypePolicy
+
+
+def _predecessor_index(s: np.ndarray, s_p: np.ndarray, states_count: int) -> (np.ndarray, np.ndarray):
+    # Predecessors of state x are predecessor_states[indptr[x]:indptr[x + 1]].
+    keys = np.unique(s_p.astype(np.int64) * states_count + s)
+    indptr = np.zeros(states_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys // states_count, minlength=states_count), out=indptr[1:])
+    return indptr, keys % states_count
+
+
+class DenseTransitionModel:
+    def __init__(self, P: np.ndarray):
+        assert P.ndim == 4 and P.shape[3] == 2
+        self.states_count = P.shape[0]
+        self.actions_count = P.shape[1]
+        self.probabilities = np.ascontiguousarray(P[:, :, :, 0])
+        self.expected_rewards = np.einsum('ijk,ijk->ij', self.probabilities, P[:, :, :, 1])
+
+    def astype(self, dtypes: DTypePolicy) -> 'DenseTransitionModel':
+        model = object.__new__(DenseTransitionModel)
+        model.states_count = self.states_count
+        model.actions_count = self.actions_count
+        model.probabilities = self.probabilities.astype(dtypes.value)
+        model.expected_rewards = self.expected_rewards.astype(dtypes.value)
+        return model
+
+    def action_values(self, V: np.ndarray, gamma: float, lo: int = 0, hi: int = None) -> np.ndarray:
+        return self.expected_rewards[lo:hi] + gamma * (self.probabilities[lo:hi] @ V)
+
+    def action_values_at(self, V: np.ndarray, gamma: float, states: np.ndarray) -> np.ndarray:
+        return self.expected_rewards[states] + gamma * (self.probabilities[states] @ V)
+
+    def action_values_of(self, V: np.ndarray, gamma: float, s: int) -> np.ndarray:
+        return self.expected_rewards[s] + gamma * (self.probabilities[s] @ V)
+
+    def predecessors(self) -> (np.ndarray, np.ndarray):
+        s, s_p = np.nonzero(np.any(self.probabilities > 0, axis=1))
+        return _predecessor_index(s, s_p, self.states_count)
+
+    def policy_transitions(self, Pi: np.ndarray, dense: bool = True):
+        P_pi = np.einsum('ij,ijk->ik', Pi, self.probabilities)
+        if dense:
+            return P_pi
+        from scipy.sparse import csr_matrix
+        return csr_matrix(P_pi)
+
+
+class SparseTransitionModel:
+    # Row r = s * actions_count + a owns the entries indptr[r]:indptr[r + 1] of
+    # next_states / probabilities / rewards, like a CSR matrix of shape (S * A, S). Row ids are
+    # stored with the dtype of next_states, which astype sets to the policy's state dtype.
+    def __init__(
+            self,
+            states_count: int,
+            actions_count: int,
+            indptr: np.ndarray,
+            next_states: np.ndarray,
+            probabilities: np.ndarray,
+            rewards: np.ndarray,
+            row_ids: np.ndarray = None,
+            expected_rewards: np.ndarray = None
+    ):
+        # row_ids and the flat expected_rewards are derived from the other arrays when not given.
+        assert indptr.shape[0] == states_count * actions_count + 1
+        assert next_states.shape == probabilities.shape == rewards.shape
+        assert indptr[-1] == next_states.shape[0]
+        self.states_count = states_count
+        self.actions_count = actions_count
+        self.indptr = indptr
+        self.next_states = next_states
+        self.probabilities = probabilities
+        self.rewards = rewards
+        assert states_count * actions_count <= np.iinfo(next_states.dtype).max
+        if row_ids is None:
+            row_ids = np.repeat(np.arange(states_count * actions_count, dtype=next_states.dtype), np.diff(indptr))
+        self.row_ids = row_ids
+        if expected_rewards is None:
+            expected_rewards = np.bincount(row_ids, weights=probabilities * rewards,
+                                           minlength=states_count * actions_count)
+        self._flat_expected_rewards = expected_rewards.astype(probabilities.dtype, copy=False)
+        self.expected_rewards = self._flat_expected_rewards.reshape(states_count, actions_count)
+
+    def astype(self, dtypes: DTypePolicy) -> 'SparseTransitionModel':
+        return SparseTransitionModel(self.states_count, self.actions_count, self.indptr,
+                                     self.next_states.astype(dtypes.state), self.probabilities.astype(dtypes.value),
+                                     self.rewards.astype(dtypes.value))
+
+    @property
+    def nnz(self) -> int:
+        return self.next_states.shape[0]
+
+    def successors(self, s: int, a: int) -> (np.ndarray, np.ndarray, np.ndarray):
+        row = s * self.actions_count + a
+        lo, hi = self.indptr[row], self.indptr[row + 1]
+        return self.next_states[lo:hi], self.probabilities[lo:hi], self.rewards[lo:hi]
+
+    def action_values(self, V: np.ndarray, gamma: float, lo: int = 0, hi: int = None) -> np.ndarray:
+        hi = self.states_count if hi is None else hi
+        row_lo, row_hi = lo * self.actions_count, hi * self.actions_count
+        e_lo, e_hi = self.indptr[row_lo], self.indptr[row_hi]
+        next_values = np.bincount(self.row_ids[e_lo:e_hi] - row_lo,
+                                  weights=self.probabilities[e_lo:e_hi] * V[self.next_states[e_lo:e_hi]],
+                                  minlength=row_hi - row_lo)
+        return (self._flat_expected_rewards[row_lo:row_hi] + gamma * next_values).reshape(hi - lo,
+                                                                                          self.actions_count)
+
+    def action_values_at(self, V: np.ndarray, gamma: float, states: np.ndarray) -> np.ndarray:
+        rows = (states[:, None] * self.actions_count + np.arange(self.actions_count)).ravel()
+        starts = self.indptr[rows]
+        counts = self.indptr[rows + 1] - starts
+        offsets = np.cumsum(counts) - counts
+        entries = np.arange(offsets[-1] + counts[-1]) + np.repeat(starts - offsets, counts)
+        next_values = np.bincount(np.repeat(np.arange(rows.shape[0]), counts),
+                                  weights=self.probabilities[entries] * V[self.next_states[entries]],
+                                  minlength=rows.shape[0])
+        return (self._flat_expected_rewards[rows] + gamma * next_values).reshape(-1, self.actions_count)
+
+    def action_values_of(self, V: np.ndarray, gamma: float, s: int) -> np.ndarray:
+        # One state's rows only: the entries indptr[s * A]:indptr[(s + 1) * A], without the
+        # gathers action_values_at needs to line up rows of several states.
+        row_lo = s * self.actions_count
+        e_lo, e_hi = self.indptr[row_lo], self.indptr[row_lo + self.actions_count]
+        next_values = np.bincount(self.row_ids[e_lo:e_hi] - row_lo,
+                                  weights=self.probabilities[e_lo:e_hi] * V[self.next_states[e_lo:e_hi]],
+                                  minlength=self.actions_count)
+        return self._flat_expected_rewards[row_lo:row_lo + self.actions_count] + gamma * next_values
+
+    def predecessors(self) -> (np.ndarray, np.ndarray):
+        positive = self.probabilities > 0
+        return _predecessor_index(self.row_ids[positive] // self.actions_count, self.next_states[positive],
+                                  self.states_count)
+
+    def policy_transitions(self, Pi: np.ndarray, dense: bool = True):
+        s = self.row_ids // self.actions_count
+        weights = Pi.ravel()[self.row_ids] * self.probabilities
+        if dense:
+            P_pi = np.zeros((self.states_count, self.states_count))
+            np.add.at(P_pi, (s, self.next_states), weights)
+            return P_pi
+        from scipy.sparse import csr_matrix
+        return csr_matrix((weights, (s, self.next_states)), shape=(self.states_count, self.states_count))
+
+    def to_dense(self) -> np.ndarray:
+        P = np.zeros((self.states_count, self.actions_count, self.states_count, 2))
+        s = self.row_ids // self.actions_count
+        a = self.row_ids % self.actions_count
+        np.add.at(P[:, :, :, 0], (s, a, self.next_states), self.probabilities)
+        P[s, a, self.next_states, 1] = self.rewards
+        return P
+
+
+def dense_to_sparse(P: np.ndarray) -> SparseTransitionModel:
+    assert P.ndim == 4 and P.shape[3] == 2
+    states_count, actions_count = P.shape[0], P.shape[1]
+    s, a, s_p = np.nonzero(P[:, :, :, 0])
+    rows = s * actions_count + a
+    indptr = np.zeros(states_count * actions_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=states_count * actions_count), out=indptr[1:])
+    return SparseTransitionModel(states_count, actions_count, indptr, s_p,
+                                 P[s, a, s_p, 0], P[s, a, s_p, 1])
+
+
+TransitionModel = Union[DenseTransitionModel, SparseTransitionModel]
+
+
+def as_transition_model(P: Union[np.ndarray, TransitionModel]) -> TransitionModel:
+    if isinstance(P, (DenseTransitionModel, SparseTransitionModel)):
+        return P
+    return DenseTransitionModel(P)
@@ -1,6 +1,151 @@
+from typing import Union
+
 import numpy as np
 
+from samplers import UniformStream, build_alias_tables
+
 
 def tabular_random_uniform_policy(state_size: int, action_size: int) -> np.ndarray:
     assert action_size > 0
     return np.ones((state_size, action_size,)) / action_size
+
+
+class TabularPolicy:
+    # sample and probs take either one state (and action) or arrays of them.
+    states_count: int
+    actions_count: int
+
+    @property
+    def shape(self) -> (int, int):
+        return self.states_count, self.actions_count
+
+    def sample(self, states):
+        raise NotImplementedError
+
+    def probs(self, states, actions):
+        raise NotImplementedError
+
+    def to_matrix(self) -> np.ndarray:
+        states = np.repeat(np.arange(self.states_count), self.actions_count)
+        actions = np.tile(np.arange(self.actions_count), self.states_count)
+        return np.asarray(self.probs(states, actions), dtype=np.float64).reshape(self.shape)
+
+    def cumulative_matrix(self) -> np.ndarray:
+        # Running sums of the rows of to_matrix(), which compiled rollouts sample actions from.
+        return np.cumsum(self.to_matrix(), axis=1)
+
+
+class StochasticPolicy(TabularPolicy):
+    def __init__(self, pi: np.ndarray, uniforms: UniformStream = None):
+        self.pi = pi
+        self.states_count, self.actions_count = pi.shape
+        self.uniforms = UniformStream() if uniforms is None else uniforms
+        self._cumulative = None
+        self.prob = np.ones(pi.shape)
+        self.alias = np.zeros(pi.shape, dtype=np.int64)
+        self.deterministic_actions = np.full(pi.shape[0], -1, dtype=np.int64)
+        self.update(np.arange(pi.shape[0]))
+
+    def update(self, states) -> None:
+        states = np.atleast_1d(states)
+        rows = self.pi[states]
+        self.prob[states], self.alias[states] = build_alias_tables(rows)
+        one_hot = np.count_nonzero(rows, axis=1) == 1
+        self.deterministic_actions[states] = np.where(one_hot, np.argmax(rows, axis=1), -1)
+        if self._cumulative is not None:
+            self._cumulative[states] = np.cumsum(rows, axis=1)
+
+    def sample(self, states):
+        if isinstance(states, np.ndarray):
+            x = self.uniforms.take(states.shape[0]) * self.actions_count
+            i = x.astype(np.int64)
+            sampled = np.where(x - i < self.prob[states, i], i, self.alias[states, i])
+            return np.where(self.deterministic_actions[states] >= 0, self.deterministic_actions[states], sampled)
+        a = self.deterministic_actions[states]
+        if a >= 0:
+            return a
+        x = self.uniforms.next() * self.actions_count
+        i = int(x)
+        return i if x - i < self.prob[states, i] else self.alias[states, i]
+
+    def probs(self, states, actions):
+        return self.pi[states, actions]
+
+    def to_matrix(self) -> np.ndarray:
+        return self.pi.copy()
+
+    def cumulative_matrix(self) -> np.ndarray:
+        # Built once, then kept in step with pi by update().
+        if self._cumulative is None:
+            self._cumulative = np.cumsum(self.pi, axis=1)
+        return self._cumulative
+
+
+class DeterministicPolicy(TabularPolicy):
+    def __init__(self, actions: np.ndarray, actions_count: int):
+        self.actions = actions
+        self.states_count = actions.shape[0]
+        self.actions_count = actions_count
+
+    def sample(self, states):
+        return self.actions[states]
+
+    def probs(self, states, actions):
+        return (self.actions[states] == actions).astype(np.float64)
+
+
+class EpsilonGreedyPolicy(TabularPolicy):
+    # Backed by Q through a cache of its greedy actions; call update(states) after writing to
+    # those rows of Q. Sharing greedy_actions between policies shares the cache.
+    def __init__(
+            self,
+            Q: np.ndarray,
+            epsilon: float,
+            greedy_actions: np.ndarray = None,
+            uniforms: UniformStream = None
+    ):
+        assert 0 <= epsilon <= 1
+        self.Q = Q
+        self.epsilon = epsilon
+        self.states_count, self.actions_count = Q.shape
+        self.greedy_actions = np.argmax(Q, axis=1) if greedy_actions is None else greedy_actions
+        self.uniforms = UniformStream() if uniforms is None else uniforms
+        self._cumulative = None
+        self._cumulative_actions = None
+        self._cumulative_epsilon = None
+
+    def update(self, states) -> None:
+        self.greedy_actions[states] = np.argmax(self.Q[states], axis=-1)
+
+    def snapshot(self) -> 'EpsilonGreedyPolicy':
+        return EpsilonGreedyPolicy(self.Q, self.epsilon, self.greedy_actions.copy())
+
+    def sample(self, states):
+        if isinstance(states, np.ndarray):
+            explore = self.uniforms.take(states.shape[0]) < self.epsilon
+            random_actions = (self.uniforms.take(states.shape[0]) * self.actions_count).astype(np.int64)
+            return np.where(explore, random_actions, self.greedy_actions[states])
+        if self.epsilon > 0 and self.uniforms.next() < self.epsilon:
+            return int(self.uniforms.next() * self.actions_count)
+        return self.greedy_actions[states]
+
+    def probs(self, states, actions):
+        return self.epsilon / self.actions_count + (1.0 - self.epsilon) * (actions == self.greedy_actions[states])
+
+    def cumulative_matrix(self) -> np.ndarray:
+        # greedy_actions can also be written through a policy sharing it, so the cached rows are
+        # refreshed wherever they differ from the greedy actions they were built for.
+        if self._cumulative is None or self._cumulative_epsilon != self.epsilon:
+            self._cumulative = np.cumsum(self.to_matrix(), axis=1)
+            self._cumulative_actions = self.greedy_actions.copy()
+            self._cumulative_epsilon = self.epsilon
+            return self._cumulative
+        changed = np.flatnonzero(self._cumulative_actions != self.greedy_actions)
+        if changed.shape[0] > 0:
+            self._cumulative[changed] = np.cumsum(self.probs(changed[:, None], np.arange(self.actions_count)), axis=1)
+            self._cumulative_actions[changed] = self.greedy_actions[changed]
+        return self._cumulative
+
+
+def as_policy(pi: Union[np.ndarray, TabularPolicy]) -> TabularPolicy:
+    return StochasticPolicy(pi) if isinstance(pi, np.ndarray) else pi
@@ -0,0 +1,139 @@
+import weakref
+
+import numpy as np
+
+from dtypes import DTypePolicy
+from models import SparseTransitionModel
+
+
+_streams = weakref.WeakSet()
+
+
+class UniformStream:
+    # Draws from rng when one is given, from np.random otherwise.
+    def __init__(self, block_size: int = 4096, rng: np.random.Generator = None):
+        assert block_size > 0
+        self.block_size = block_size
+        self.rng = rng
+        self._block = []
+        self._position = 0
+        _streams.add(self)
+
+    def clear(self) -> None:
+        self._block = []
+        self._position = 0
+
+    def __getstate__(self) -> dict:
+        return {'block_size': self.block_size, 'rng': self.rng}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state['block_size'], state['rng'])
+
+    def next(self) -> float:
+        if self._position == len(self._block):
+            self._block = (np.random if self.rng is None else self.rng).random(self.block_size).tolist()
+            self._position = 0
+        u = self._block[self._position]
+        self._position += 1
+        return u
+
+    def take(self, n: int) -> np.ndarray:
+        return (np.random if self.rng is None else self.rng).random(n)
+
+
+def clear_streams() -> None:
+    # Drops the uniforms already drawn into every stream, so the next ones come straight from np.random.
+    for stream in list(_streams):
+        stream.clear()
+
+
+def reseed(seed) -> None:
+    # Reseeds np.random and clears the streams, so a forked worker does not replay the blocks it
+    # inherited from its parent.
+    np.random.seed(seed)
+    clear_streams()
+
+
+def build_alias_tables(probabilities: np.ndarray) -> (np.ndarray, np.ndarray):
+    # Walker's method run on every row at once: each pass pairs the smallest unfinished
+    # column of a row with its largest one, so the loop runs over columns, not rows.
+    rows_count, columns_count = probabilities.shape
+    totals = np.sum(probabilities, axis=1, keepdims=True)
+    scaled = np.where(totals > 0, probabilities / np.where(totals > 0, totals, 1.0), 1.0 / columns_count)
+    scaled = scaled * columns_count
+    prob = np.ones((rows_count, columns_count))
+    alias = np.tile(np.arange(columns_count), (rows_count, 1))
+    finished = np.zeros((rows_count, columns_count), dtype=bool)
+    rows = np.arange(rows_count)
+    for _ in range(columns_count - 1):
+        small = np.argmin(np.where(finished, np.inf, scaled), axis=1)
+        large = np.argmax(np.where(finished, -np.inf, scaled), axis=1)
+        prob[rows, small] = scaled[rows, small]
+        alias[rows, small] = large
+        scaled[rows, large] -= 1.0 - scaled[rows, small]
+        finished[rows, small] = True
+    return prob, alias
+
+
+# The arrays a TransitionSampler builds from its model, which can be saved and handed back to it.
+TRANSITION_SAMPLER_TABLES = ("entries", "prob", "alias_entries", "deterministic_entries")
+
+
+class TransitionSampler:
+    # Entry tables use dtypes.state and prob uses dtypes.value; without dtypes they follow the
+    # model's next_states and probabilities. tables, when given, holds the arrays named in
+    # TRANSITION_SAMPLER_TABLES as built earlier for the same model, and nothing is rebuilt.
+    def __init__(
+            self,
+            model: SparseTransitionModel,
+            uniforms: UniformStream = None,
+            dtypes: DTypePolicy = None,
+            tables: dict = None
+    ):
+        self.model = model
+        self.uniforms = UniformStream() if uniforms is None else uniforms
+        if tables is not None:
+            self.entries, self.prob, self.alias_entries, self.deterministic_entries = (
+                tables[name] for name in TRANSITION_SAMPLER_TABLES)
+            assert self.entries.shape[0] == model.states_count * model.actions_count
+            self.columns_count = self.entries.shape[1]
+            return
+        index_dtype = model.next_states.dtype if dtypes is None else dtypes.state
+        value_dtype = model.probabilities.dtype if dtypes is None else dtypes.value
+        assert np.issubdtype(index_dtype, np.signedinteger) and model.nnz <= np.iinfo(index_dtype).max
+        counts = np.diff(model.indptr)
+        self.columns_count = max(int(np.max(counts, initial=1)), 1)
+
+        # entries[r, i] is the i-th successor entry of row r, padded with zero-probability columns.
+        column = np.arange(model.nnz) - model.indptr[model.row_ids]
+        entries = np.zeros((counts.shape[0], self.columns_count), dtype=index_dtype)
+        probabilities = np.zeros((counts.shape[0], self.columns_count))
+        entries[model.row_ids, column] = np.arange(model.nnz)
+        probabilities[model.row_ids, column] = model.probabilities
+        prob, alias = build_alias_tables(probabilities)
+        self.prob = prob.astype(value_dtype, copy=False)
+        self.entries = entries
+        self.alias_entries = np.take_along_axis(entries, alias, axis=1)
+        self.deterministic_entries = np.where(counts == 1, model.indptr[:-1], -1).astype(index_dtype)
+
+    @property
+    def tables(self) -> dict:
+        return {name: getattr(self, name) for name in TRANSITION_SAMPLER_TABLES}
+
+    def sample(self, state: int, action: int) -> (int, float):
+        # int() keeps a one-byte action from turning the row into a uint8 when state is a Python int.
+        row = state * self.model.actions_count + int(action)
+        e = self.deterministic_entries[row]
+        if e < 0:
+            x = self.uniforms.next() * self.columns_count
+            i = int(x)
+            e = self.entries[row, i] if x - i < self.prob[row, i] else self.alias_entries[row, i]
+        return self.model.next_states[e], self.model.rewards[e]
+
+    def sample_batch(self, states: np.ndarray, actions: np.ndarray) -> (np.ndarray, np.ndarray):
+        rows = states * self.model.actions_count + actions
+        x = self.uniforms.take(rows.shape[0]) * self.columns_count
+        i = x.astype(np.int64)
+        e = np.where(x - i < self.prob[rows, i], self.entries[rows, i], self.alias_entries[rows, i])
+        e = np.where(self.deterministic_entries[rows] >= 0, self.deterministic_entries[rows], e)
+        return self.model.next_states[e], self.model.rewards[e]
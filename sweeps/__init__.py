@@ -0,0 +1,214 @@
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Callable
+
+import numpy as np
+
+import algorithms
+from envs import VectorEnv
+from grid_world import make_grid_world
+from instrumentation import Stats
+from line_world import make_line_world
+from models import SparseTransitionModel
+
+SWEEP_ALGORITHMS = {
+    "tabular_sarsa_control": algorithms.tabular_sarsa_control,
+    "tabular_q_learning_control": algorithms.tabular_q_learning_control
+}
+
+# Greedy policies are scored with one discount whatever gamma they were trained with, so runs
+# with different gammas stay comparable.
+EVALUATION_GAMMA = 0.99
+
+
+def make_env(name: str) -> VectorEnv:
+    # "line_world:<states>" or "grid_world:<side>"
+    kind, size = name.split(":")
+    if kind == "line_world":
+        return make_line_world(int(size))
+    assert kind == "grid_world"
+    return make_grid_world(int(size), int(size)).env
+
+
+class SharedEnv:
+    # Copies the arrays of a VectorEnv into shared memory once; handle is what gets pickled into
+    # each task, and workers rebuild the environment on views of those arrays.
+    def __init__(self, env: VectorEnv):
+        model = env.model
+        arrays = {
+            "indptr": model.indptr,
+            "next_states": model.next_states,
+            "probabilities": model.probabilities,
+            "rewards": model.rewards,
+            "terminal_mask": env.terminal_mask
+        }
+        self._blocks = []
+        specs = {}
+        for name, array in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+            self._blocks.append(block)
+            specs[name] = (block.name, array.shape, array.dtype.str)
+        self.handle = {
+            "states_count": model.states_count,
+            "actions_count": model.actions_count,
+            "start_state": int(env.start_state),
+            "arrays": specs
+        }
+
+    def __enter__(self) -> 'SharedEnv':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+# Blocks attached by this process, kept open for as long as it lives.
+_attached = {}
+
+
+def attach_env(handle: dict, rng: np.random.Generator = None) -> VectorEnv:
+    arrays = {}
+    for name, (block_name, shape, dtype) in handle["arrays"].items():
+        if block_name not in _attached:
+            _attached[block_name] = shared_memory.SharedMemory(name=block_name)
+        arrays[name] = np.ndarray(shape, np.dtype(dtype), buffer=_attached[block_name].buf)
+    model = SparseTransitionModel(handle["states_count"], handle["actions_count"], arrays["indptr"],
+                                  arrays["next_states"], arrays["probabilities"], arrays["rewards"])
+    return VectorEnv(model, np.flatnonzero(arrays["terminal_mask"]), handle["start_state"], rng=rng)
+
+
+def _run(algorithm: str, env_name: str, handle: dict, params: dict, seed: int) -> dict:
+    # Every random number of the run comes from one Generator seeded by seed alone, so a run gives
+    # the same result whichever worker runs it and whatever ran there before.
+    rng = np.random.default_rng(np.random.SeedSequence(seed))
+    env = attach_env(handle, rng)
+    stats = Stats()
+    Q, _ = SWEEP_ALGORITHMS[algorithm](env.n_states, env.n_actions, env.reset, env.step, env.is_terminal, rng=rng,
+                                       stats=stats, **params)
+    Pi = np.zeros(Q.shape)
+    Pi[np.arange(env.n_states), np.argmax(Q, axis=1)] = 1.0
+    T = np.flatnonzero(env.terminal_mask)
+    V = algorithms.linear_policy_evaluation(np.arange(env.n_states), np.arange(env.n_actions), env.model, T, Pi,
+                                            EVALUATION_GAMMA)
+    return {
+        "algorithm": algorithm,
+        "env": env_name,
+        "params": params,
+        "seed": seed,
+        "start_value": float(V[env.start_state]),
+        "episodes": stats.episodes,
+        "env_steps": stats.env_steps,
+        "wall_time": stats.wall_time
+    }
+
+
+def sweep_tasks(algorithm_names: list, env_names: list, grid: dict, seeds: list) -> list:
+    names = sorted(grid)
+    return [(algorithm, env_name, dict(zip(names, values)), seed)
+            for algorithm in algorithm_names
+            for env_name in env_names
+            for values in itertools.product(*(grid[name] for name in names))
+            for seed in seeds]
+
+
+def _key(algorithm: str, env_name: str, params: dict, seed: int) -> str:
+    return json.dumps([algorithm, env_name, params, seed], sort_keys=True)
+
+
+def load_results(path: str) -> list:
+    # A line cut short by an interrupted sweep is skipped; its run is simply done again.
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def _drop_partial_line(path: str) -> None:
+    # An interrupted sweep can leave its last record half-written; appending after it would merge
+    # the next record into the same unreadable line.
+    if not os.path.exists(path):
+        return
+    with open(path, "rb+") as f:
+        content = f.read()
+        if content and not content.endswith(b"\n"):
+            f.truncate(content.rfind(b"\n") + 1)
+
+
+def run_sweep(
+        envs: dict,
+        algorithm_names: list,
+        grid: dict,
+        seeds: list,
+        output: str,
+        n_jobs: int = 1,
+        log: Callable = None
+) -> list:
+    # Records are appended to output (one JSON object per line) as runs finish; runs already in
+    # output are not run again, so an interrupted sweep picks up where it stopped.
+    assert n_jobs > 0
+    assert all(name in SWEEP_ALGORITHMS for name in algorithm_names)
+    records = load_results(output)
+    done = {_key(r["algorithm"], r["env"], r["params"], r["seed"]) for r in records}
+    tasks = [task for task in sweep_tasks(algorithm_names, list(envs), grid, seeds) if _key(*task) not in done]
+    if not tasks:
+        return records
+
+    _drop_partial_line(output)
+    shared = {name: SharedEnv(env) for name, env in envs.items()}
+    try:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor, open(output, "a") as f:
+            futures = [executor.submit(_run, algorithm, env_name, shared[env_name].handle, params, seed)
+                       for algorithm, env_name, params, seed in tasks]
+            try:
+                for future in as_completed(futures):
+                    record = future.result()
+                    f.write(json.dumps(record) + "\n")
+                    f.flush()
+                    records.append(record)
+                    if log is not None:
+                        log(record)
+            except BaseException:
+                executor.shutdown(wait=True, cancel_futures=True)
+                raise
+    finally:
+        for env in shared.values():
+            env.close()
+    return records
+
+
+def summarize(records: list) -> list:
+    # One row per (algorithm, env, params), averaged over seeds.
+    groups = {}
+    for record in records:
+        key = json.dumps([record["algorithm"], record["env"], record["params"]], sort_keys=True)
+        groups.setdefault(key, []).append(record)
+    rows = []
+    for runs in groups.values():
+        values = np.array([run["start_value"] for run in runs])
+        rows.append({
+            "algorithm": runs[0]["algorithm"],
+            "env": runs[0]["env"],
+            "params": runs[0]["params"],
+            "runs": len(runs),
+            "start_value_mean": float(np.mean(values)),
+            "start_value_std": float(np.std(values)),
+            "wall_time_mean": float(np.mean([run["wall_time"] for run in runs]))
+        })
+    rows.sort(key=lambda row: (row["algorithm"], row["env"], -row["start_value_mean"]))
+    return rows
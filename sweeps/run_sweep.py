@@ -0,0 +1,39 @@
+import argparse
+
+from sweeps import SWEEP_ALGORITHMS, make_env, run_sweep, summarize
+
+
+def _print_record(record: dict) -> None:
+    print("{algorithm:<28} {env:<16} seed={seed:<4} {params} start_value={start_value:.4f} "
+          "{wall_time:.2f}s".format(**record), flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default="sweep_results.jsonl")
+    parser.add_argument("--algorithms", nargs="*", default=list(SWEEP_ALGORITHMS))
+    parser.add_argument("--envs", nargs="*", default=["line_world:100", "grid_world:16"],
+                        help="line_world:<states> or grid_world:<side>")
+    parser.add_argument("--alpha", nargs="*", type=float, default=[0.01, 0.1])
+    parser.add_argument("--epsilon", nargs="*", type=float, default=[0.1, 0.3])
+    parser.add_argument("--gamma", nargs="*", type=float, default=[0.99])
+    parser.add_argument("--max-episodes", nargs="*", type=int, default=[1000])
+    parser.add_argument("--max-steps-per-episode", type=int, default=1000)
+    parser.add_argument("--seeds", type=int, default=5, help="runs seeds 0 to seeds - 1")
+    parser.add_argument("--n-jobs", type=int, default=1)
+    args = parser.parse_args()
+
+    grid = {
+        "alpha": args.alpha,
+        "epsilon": args.epsilon,
+        "gamma": args.gamma,
+        "max_episodes": args.max_episodes,
+        "max_steps_per_episode": [args.max_steps_per_episode]
+    }
+    envs = {name: make_env(name) for name in args.envs}
+    records = run_sweep(envs, args.algorithms, grid, list(range(args.seeds)), args.output, args.n_jobs,
+                        log=_print_record)
+    print("Results written to", args.output)
+    for row in summarize(records):
+        print("{algorithm:<28} {env:<16} runs={runs:<3} {params} start_value={start_value_mean:.4f} "
+              "+- {start_value_std:.4f}".format(**row))
@@ -0,0 +1,152 @@
+import json
+import os
+import tempfile
+from typing import Callable, Union
+
+import numpy as np
+
+from policies import TabularPolicy, as_policy
+from utils import TrajectoryBuffer, step_until_the_end_of_the_episode_and_generate_trajectory
+
+INDEX = "index.json"
+
+# Every chunk is a directory holding one .npy file per column; episode e of a chunk is the slice
+# offsets[e]:offsets[e + 1] of every column.
+_COLUMNS = {
+    "states": np.int32,
+    "actions": np.int32,
+    "next_states": np.int32,
+    "rewards": np.float64,
+    "behaviour_probabilities": np.float64
+}
+
+
+class TrajectoryWriter:
+    # Episodes are buffered until the chunk holds chunk_size transitions, then written out.
+    # The index is rewritten atomically after every chunk, so a reader never sees a partial one.
+    def __init__(self, directory: str, chunk_size: int = 65536):
+        assert chunk_size > 0
+        self.directory = directory
+        self.chunk_size = chunk_size
+        os.makedirs(directory, exist_ok=True)
+        self.chunks = _read_index(directory)
+        self._columns = {name: np.zeros(chunk_size, dtype=dtype) for name, dtype in _COLUMNS.items()}
+        self._offsets = [0]
+
+    def __enter__(self) -> 'TrajectoryWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def append(
+            self,
+            states: np.ndarray,
+            actions: np.ndarray,
+            next_states: np.ndarray,
+            rewards: np.ndarray,
+            behaviour_probabilities: np.ndarray
+    ) -> None:
+        length = states.shape[0]
+        if self._offsets[-1] + length > self.chunk_size:
+            self.flush()
+        if length > self.chunk_size:
+            # An episode longer than a chunk gets a chunk of its own.
+            self._columns = {name: np.zeros(length, dtype=dtype) for name, dtype in _COLUMNS.items()}
+        lo, hi = self._offsets[-1], self._offsets[-1] + length
+        for name, values in zip(_COLUMNS, (states, actions, next_states, rewards, behaviour_probabilities)):
+            self._columns[name][lo:hi] = values
+        self._offsets.append(hi)
+
+    def flush(self) -> None:
+        if len(self._offsets) == 1:
+            return
+        name = "chunk-{:06d}".format(len(self.chunks))
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.directory)
+        size = self._offsets[-1]
+        for column, values in self._columns.items():
+            np.save(os.path.join(tmp, column + ".npy"), values[:size])
+        np.save(os.path.join(tmp, "offsets.npy"), np.array(self._offsets, dtype=np.int64))
+        os.rename(tmp, os.path.join(self.directory, name))
+        self.chunks.append({"name": name, "episodes": len(self._offsets) - 1, "transitions": size})
+        _write_index(self.directory, self.chunks)
+        self._columns = {column: np.zeros(self.chunk_size, dtype=dtype) for column, dtype in _COLUMNS.items()}
+        self._offsets = [0]
+
+    def close(self) -> None:
+        self.flush()
+
+
+def _read_index(directory: str) -> list:
+    path = os.path.join(directory, INDEX)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return json.load(f)["chunks"]
+
+
+def _write_index(directory: str, chunks: list) -> None:
+    tmp = os.path.join(directory, INDEX + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump({"columns": list(_COLUMNS), "chunks": chunks}, f)
+    os.replace(tmp, os.path.join(directory, INDEX))
+
+
+class TrajectoryChunk:
+    def __init__(self, path: str):
+        self.offsets = np.load(os.path.join(path, "offsets.npy"))
+        for column in _COLUMNS:
+            setattr(self, column, np.load(os.path.join(path, column + ".npy"), mmap_mode='r'))
+
+    @property
+    def episodes_count(self) -> int:
+        return self.offsets.shape[0] - 1
+
+    def episode(self, e: int) -> (np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray):
+        lo, hi = self.offsets[e], self.offsets[e + 1]
+        return (self.states[lo:hi], self.actions[lo:hi], self.next_states[lo:hi], self.rewards[lo:hi],
+                self.behaviour_probabilities[lo:hi])
+
+
+class TrajectoryStore:
+    # Read side of a TrajectoryWriter directory: chunks are memory-mapped one at a time.
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.chunk_entries = _read_index(directory)
+
+    @property
+    def episodes_count(self) -> int:
+        return sum(entry["episodes"] for entry in self.chunk_entries)
+
+    @property
+    def transitions_count(self) -> int:
+        return sum(entry["transitions"] for entry in self.chunk_entries)
+
+    def chunks(self):
+        for entry in self.chunk_entries:
+            yield TrajectoryChunk(os.path.join(self.directory, entry["name"]))
+
+    def episodes(self):
+        for chunk in self.chunks():
+            for e in range(chunk.episodes_count):
+                yield chunk.episode(e)
+
+
+def record_episodes(
+        directory: str,
+        pi: Union[np.ndarray, TabularPolicy],
+        reset_func: Callable,
+        step_func: Callable,
+        is_terminal_func: Callable,
+        max_episodes: int = 1000,
+        max_steps_per_episode: int = 10,
+        chunk_size: int = 65536
+) -> TrajectoryStore:
+    policy = as_policy(pi)
+    buffer = TrajectoryBuffer(max_steps_per_episode, prepend_capacity=0)
+    with TrajectoryWriter(directory, chunk_size) as writer:
+        for episode_id in range(max_episodes):
+            s_list, a_list, s_p_list, r_list = step_until_the_end_of_the_episode_and_generate_trajectory(
+                reset_func(), policy, step_func, is_terminal_func, max_steps_per_episode, buffer)
+            writer.append(s_list, a_list, s_p_list, r_list, policy.probs(s_list, a_list))
+    return TrajectoryStore(directory)
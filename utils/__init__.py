@@ -1,30 +1,250 @@
-from typing import Callable
+from typing import Callable, Union
 
 import numpy as np
 
+from envs import TabularEnv, VectorEnv
+from kernels import compiled_arrays, kernel_seed, rollout_kernel, use_numba
+from policies import TabularPolicy, as_policy
+
+
+class TrajectoryBuffer:
+    # Transitions live in [start, end). Appending writes at end; prepending writes just before
+    # start into the slots reserved by prepend_capacity, so neither ever moves the stored data.
+    def __init__(self, max_steps: int, prepend_capacity: int = 1):
+        assert max_steps > 0
+        assert prepend_capacity >= 0
+        self.max_steps = max_steps
+        self.prepend_capacity = prepend_capacity
+        size = max_steps + prepend_capacity
+        self._states = np.zeros(size, dtype=np.int32)
+        self._actions = np.zeros(size, dtype=np.int32)
+        self._next_states = np.zeros(size, dtype=np.int32)
+        self._rewards = np.zeros(size, dtype=np.float64)
+        self.start = prepend_capacity
+        self.end = prepend_capacity
+
+    def clear(self) -> None:
+        self.start = self.prepend_capacity
+        self.end = self.prepend_capacity
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def append(self, s: int, a: int, s_p: int, r: float) -> None:
+        assert self.end < self._states.shape[0]
+        self._states[self.end] = s
+        self._actions[self.end] = a
+        self._next_states[self.end] = s_p
+        self._rewards[self.end] = r
+        self.end += 1
+
+    def prepend(self, s: int, a: int, s_p: int, r: float) -> None:
+        assert self.start > 0
+        self.start -= 1
+        self._states[self.start] = s
+        self._actions[self.start] = a
+        self._next_states[self.start] = s_p
+        self._rewards[self.start] = r
+
+    @property
+    def states(self) -> np.ndarray:
+        return self._states[self.start:self.end]
+
+    @property
+    def actions(self) -> np.ndarray:
+        return self._actions[self.start:self.end]
+
+    @property
+    def next_states(self) -> np.ndarray:
+        return self._next_states[self.start:self.end]
+
+    @property
+    def rewards(self) -> np.ndarray:
+        return self._rewards[self.start:self.end]
+
+
+class ReplayBuffer:
+    # Fixed-capacity ring of (s, a, r, s') transitions: add writes at position and, once the ring is
+    # full, overwrites the oldest one. priorities[i] weights transition i in prioritized sampling.
+    def __init__(self, capacity: int):
+        assert capacity > 0
+        self.capacity = capacity
+        self.states = np.zeros(capacity, dtype=np.int32)
+        self.actions = np.zeros(capacity, dtype=np.int32)
+        self.rewards = np.zeros(capacity, dtype=np.float64)
+        self.next_states = np.zeros(capacity, dtype=np.int32)
+        self.priorities = np.zeros(capacity, dtype=np.float64)
+        self.position = 0
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def write(self, i: int, s: int, a: int, r: float, s_p: int, priority: float = 1.0) -> None:
+        self.states[i] = s
+        self.actions[i] = a
+        self.rewards[i] = r
+        self.next_states[i] = s_p
+        self.priorities[i] = priority
+
+    def add(self, s: int, a: int, r: float, s_p: int, priority: float = 1.0) -> int:
+        i = self.position
+        self.write(i, s, a, r, s_p, priority)
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        return i
+
+    def sample(self, n: int, prioritized: bool = False) -> np.ndarray:
+        # Indices of n transitions drawn with replacement, uniformly or in proportion to their priorities.
+        assert self.size > 0
+        if prioritized:
+            cumulative = np.cumsum(self.priorities[:self.size])
+            if cumulative[-1] > 0:
+                indices = np.searchsorted(cumulative, np.random.random(n) * cumulative[-1], side='right')
+                return np.minimum(indices, self.size - 1)
+        return np.random.randint(self.size, size=n)
+
+
+class SparseTraces:
+    # Eligibility traces kept as an active set: keys[:size] and values[:size] are the nonzero traces
+    # and slot_of_key maps a key to its slot, -1 when its trace is zero. Traces that decay below
+    # threshold are dropped, so each operation costs O(size) rather than O(keys_count).
+    def __init__(self, keys_count: int, threshold: float = 1e-4):
+        assert threshold >= 0
+        self.keys = np.zeros(keys_count, dtype=np.int64)
+        self.values = np.zeros(keys_count, dtype=np.float64)
+        self.slot_of_key = np.full(keys_count, -1, dtype=np.int64)
+        self.threshold = threshold
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def active_keys(self) -> np.ndarray:
+        return self.keys[:self.size]
+
+    def visit(self, key: int, replacing: bool = False) -> None:
+        slot = self.slot_of_key[key]
+        if slot < 0:
+            slot = self.size
+            self.keys[slot] = key
+            self.values[slot] = 0.0
+            self.slot_of_key[key] = slot
+            self.size += 1
+        self.values[slot] = 1.0 if replacing else self.values[slot] + 1.0
+
+    def add_to(self, table: np.ndarray, step: float) -> None:
+        # table.flat[key] += step * trace for every active key; keys are unique, so no np.add.at.
+        flat = table.reshape(-1)
+        flat[self.keys[:self.size]] += step * self.values[:self.size]
+
+    def decay(self, factor: float) -> None:
+        values = self.values[:self.size]
+        values *= factor
+        dropped = values < self.threshold
+        if np.any(dropped):
+            keys = self.keys[:self.size]
+            self.slot_of_key[keys[dropped]] = -1
+            kept = ~dropped
+            size = np.count_nonzero(kept)
+            self.keys[:size] = keys[kept]
+            self.values[:size] = values[kept]
+            self.size = size
+            self.slot_of_key[self.keys[:size]] = np.arange(size)
+
+    def clear(self) -> None:
+        self.slot_of_key[self.keys[:self.size]] = -1
+        self.size = 0
+
+
+def discounted_returns(rewards: np.ndarray, gamma: float) -> np.ndarray:
+    # G_t = sum_k gamma^k r_{t+k} as a reverse cumsum of r_t * gamma^t divided by gamma^t,
+    # done in blocks short enough for gamma^t not to underflow.
+    rewards = np.asarray(rewards, dtype=np.float64)
+    steps = rewards.shape[0]
+    G = np.empty(steps)
+    if steps == 0 or gamma == 0:
+        G[:] = rewards
+        return G
+    block = steps if gamma >= 1 else int(min(steps, max(1, -200 / np.log10(gamma))))
+    powers = gamma ** np.arange(block)
+    carry = 0.0
+    for end in range(steps, 0, -block):
+        start = max(0, end - block)
+        p = powers[:end - start]
+        G[start:end] = np.cumsum((rewards[start:end] * p)[::-1])[::-1] / p + carry * gamma * p[::-1]
+        carry = G[start]
+    return G
+
+
+def first_visit_mask(keys: np.ndarray, first_index: np.ndarray) -> np.ndarray:
+    # first_index is a scratch array indexed by key, holding its dtype's max everywhere;
+    # it is left in that state on return so it can be reused across episodes.
+    t = np.arange(keys.shape[0])
+    np.minimum.at(first_index, keys, t)
+    mask = first_index[keys] == t
+    first_index[keys] = np.iinfo(first_index.dtype).max
+    return mask
+
+
+def first_visit_scratch(keys_count: int) -> np.ndarray:
+    return np.full(keys_count, np.iinfo(np.int64).max, dtype=np.int64)
+
+
+def terminal_mask_of(is_terminal_func: Callable, states_count: int) -> np.ndarray:
+    # A bound TabularEnv.is_terminal already has its mask; any other predicate is asked once per state.
+    env = getattr(is_terminal_func, '__self__', None)
+    if isinstance(env, TabularEnv):
+        return env.terminal_mask
+    return np.array([bool(is_terminal_func(s)) for s in range(states_count)], dtype=bool)
+
+
+def scatter_update(table: np.ndarray, keys: np.ndarray, deltas: np.ndarray, alpha: float,
+                   duplicates: str = "serial") -> None:
+    # Applies table.flat[keys] += alpha * deltas for a batch of updates. When a key appears k times,
+    # "sum" applies all of its deltas, "mean" applies their average once and "serial" applies their
+    # average with the step 1 - (1 - alpha) ** k that k serial updates towards the same targets add
+    # up to: close to "sum" while alpha * k is small, and never past the targets when it is not.
+    assert duplicates in ("serial", "mean", "sum")
+    flat = table.reshape(-1)
+    if duplicates == "sum":
+        np.add.at(flat, keys, alpha * deltas)
+        return
+    unique_keys, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    steps = alpha if duplicates == "mean" else 1.0 - (1.0 - alpha) ** counts
+    flat[unique_keys] += steps * np.bincount(inverse, weights=deltas) / counts
+
 
 def step_until_the_end_of_the_episode_and_generate_trajectory(
         s0: int,
-        pi: np.ndarray,
+        pi: Union[np.ndarray, TabularPolicy],
         step_func: Callable,
         is_terminal_func: Callable,
-        max_steps: int = 10
-) -> ([int], [int], [int], [float]):
-    s_list = []
-    a_list = []
-    s_p_list = []
-    r_list = []
+        max_steps: int = 10,
+        buffer: TrajectoryBuffer = None,
+        env: VectorEnv = None,
+        backend: str = "python"
+) -> (np.ndarray, np.ndarray, np.ndarray, np.ndarray):
+    if buffer is None:
+        buffer = TrajectoryBuffer(max_steps, prepend_capacity=0)
+    assert buffer.max_steps >= max_steps
+    buffer.clear()
+    if use_numba(backend, env, step_func, is_terminal_func):
+        pi_cumulative = np.cumsum(pi, axis=1) if isinstance(pi, np.ndarray) else pi.cumulative_matrix()
+        lo, hi = buffer.start, buffer.start + max_steps
+        buffer.end += rollout_kernel(*compiled_arrays(env)[:5], pi_cumulative, s0, max_steps,
+                                     buffer._states[lo:hi], buffer._actions[lo:hi], buffer._next_states[lo:hi],
+                                     buffer._rewards[lo:hi], kernel_seed())
+        return buffer.states, buffer.actions, buffer.next_states, buffer.rewards
     st = s0
-    actions = np.arange(pi.shape[1])
+    policy = as_policy(pi)
     step = 0
     while not is_terminal_func(st) and step < max_steps:
-        at = np.random.choice(actions, p=pi[st])
+        at = policy.sample(st)
         st_p, rt_p, terminal = step_func(st, at)
-        s_list.append(st)
-        a_list.append(at)
-        s_p_list.append(st_p)
-        r_list.append(rt_p)
+        buffer.append(st, at, st_p, rt_p)
         st = st_p
         step += 1
 
-    return s_list, a_list, s_p_list, r_list
+    return buffer.states, buffer.actions, buffer.next_states, buffer.rewards